@@ -1,5 +1,7 @@
 import os
+import sys
 import shutil
+import argparse
 import rasterio
 import numpy as np
 import pandas as pd
@@ -9,10 +11,18 @@ from rasterio.mask import mask
 from scipy.interpolate import griddata
 from rasterio.transform import from_origin
 from dateutil.relativedelta import relativedelta
-import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap
+
+# The modules are shared by every country, in the directory above
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from modules.geoglows import Geoglows
 from modules.nalbantis import Nalbantis
+from modules.idw import IDW
+from modules.palette import Palette
+from modules.render import Renderer, FigureTemplate, MapPool
+from modules.boundary import Boundary
+from modules.archive import SDIArchive
+from modules.climatology import Climatology
+from modules.gridded import GriddedSDI
 
 # Date
 DATE = dt.datetime.now().replace(day=1) - pd.DateOffset(months=1)
@@ -25,239 +35,405 @@ DAT_DIR = "data/historical"
 COMIDS_PATH = "assets/Esta_Bolivia.csv"
 OUT_PATH = "data/historical/"
 OUT_PATH_FORMATED = "data/formated_historical/"
-OUTPUT_FILE = f"data/index/txt/{DATE.strftime('%Y_%m')}.csv"
+CACHE_DIR = "data/cache"
+ARCHIVE_DIR = "data/archive"
+GRIDDED_DIR = "data/gridded"
+SHAPEFILE = "assets/bolivia.shp"
+BOUNDARY = Boundary(SHAPEFILE, cache_dir=CACHE_DIR)
+
+# Interpolation grid (cell centers, 0.25°)
+GRID_X_RANGE = (-73.75, -56.00)
+GRID_Y_RANGE = (-23.50, -9.00)
+
+# Map extent of the matplotlib figures
+PLOT_XLIM = (-73.75, -56.00)
+PLOT_YLIM = (-23.50, -9.0)
+
+# Approximate height of the PNG maps in pixels
+MAP_HEIGHT = 480
 
-TIF01_FILE = f"data/index/tif/{DATE.strftime('%Y_%m_01')}.tif"
-TIF03_FILE = f"data/index/tif/{DATE.strftime('%Y_%m_03')}.tif"
-TIF06_FILE = f"data/index/tif/{DATE.strftime('%Y_%m_06')}.tif"
-TIF09_FILE = f"data/index/tif/{DATE.strftime('%Y_%m_09')}.tif"
-TIF12_FILE = f"data/index/tif/{DATE.strftime('%Y_%m_12')}.tif"
+# SDI colour table shared by the maps
+PALETTE = Palette()
 
-PNG01_FILE = f"data/index/png/{DATE.strftime('%Y_%m_01')}.png"
-PNG03_FILE = f"data/index/png/{DATE.strftime('%Y_%m_03')}.png"
-PNG06_FILE = f"data/index/png/{DATE.strftime('%Y_%m_06')}.png"
-PNG09_FILE = f"data/index/png/{DATE.strftime('%Y_%m_09')}.png"
-PNG12_FILE = f"data/index/png/{DATE.strftime('%Y_%m_12')}.png"
+# Number of COMID batches downloaded concurrently
+DOWNLOAD_WORKERS = 4
 
+# Number of COMIDs in each fixed (not chunk-aligned) batch, all at once if None
+BATCH_SIZE = 100
 
+# Number of PNG maps rendered concurrently (one process each, up to one per core)
+PLOT_WORKERS = min(5, os.cpu_count() or 1)
 
-def clear_output_directories():
-    """Delete and recreate output directories."""
-    for dir_path in [PNG_DIR, TIF_DIR, TXT_DIR, DAT_DIR]:
+# SDI scales (months) of the outputs
+SCALES = [1, 3, 6, 9, 12]
+
+
+
+def clear_output_directories(full=True):
+    """Delete and recreate output directories (keeping the historical data
+    unless a full rebuild is requested)."""
+    dir_paths = [PNG_DIR, TIF_DIR, TXT_DIR] + ([DAT_DIR] if full else [])
+    for dir_path in dir_paths:
         if os.path.exists(dir_path):
             shutil.rmtree(dir_path)
         os.makedirs(dir_path)
+    for dir_path in [DAT_DIR, OUT_PATH_FORMATED, ARCHIVE_DIR]:
+        os.makedirs(dir_path, exist_ok=True)
+
 
+def month_files(date=DATE):
+    """Output paths of one month: the SDI table, the multiband GeoTIFF and
+    the GeoTIFF and PNG of each scale."""
+    month = date.strftime('%Y_%m')
+    tif_files = [f"{TIF_DIR}/{month}_{scale:02d}.tif" for scale in SCALES]
+    png_files = [f"{PNG_DIR}/{month}_{scale:02d}.png" for scale in SCALES]
+    return f"{TXT_DIR}/{month}.csv", f"{TIF_DIR}/{month}.tif", tif_files, png_files
 
-def download_data(glw):
+
+def download_data(glw, full=True, export_csv=False):
     """Download data and return verified COMIDs."""
     dataset = glw.get_bucket()
     comids = glw.verify_comids(ds=dataset, csv=COMIDS_PATH)
-    data = glw.get_data(ds=dataset, comids=comids)
-    glw.save_data(data=data, save_type="individual", dir_path=OUT_PATH)
-    glw.save_format_data(data=data, save_type="individual", dir_path=OUT_PATH_FORMATED)
-
-
-def compute_sdi(metadata):
-    """Compute the Streamflow Drought Index for each COMID."""
-    sdi_outputs = []
-
-    for comid in metadata.comid:
-        print(comid)
-        try:
-            file_path = f"{OUT_PATH}{comid}.csv"
-            data = pd.read_csv(file_path, sep=",", index_col=0)
-            data.index = pd.to_datetime(data.index)
-
-            # Prepare the DataFrame
-            data.columns = ["value"]
-            data = pd.DataFrame({
-                'year': data.index.year,
-                'month': data.index.month,
-                'day': data.index.day,
-                'value': data['value']
-            })
-
-            # Compute the Nalbantis index
-            nlb = Nalbantis()
-            sdi = nlb.compute_overall(data)
-            sdi = sdi.tail(1)
-
-            sdi_output = {
-                'comid': comid,
-                '1': round(sdi.sdi_value_1m.iloc[0], 3),
-                '3': round(sdi.sdi_value_3m.iloc[0], 3),
-                '6': round(sdi.sdi_value_6m.iloc[0], 3),
-                '9': round(sdi.sdi_value_9m.iloc[0], 3),
-                '12': round(sdi.sdi_value_12m.iloc[0], 3),
-            }
-            sdi_outputs.append(sdi_output)
-
-        except:
-            pass
-
-    return pd.DataFrame(sdi_outputs)
-
-
-def color(pixelValue: float) -> str:
-    if -10.0 <= pixelValue < -2.75:
-        return '#890002'
-    elif -2.75 <= pixelValue < -2.5:
-        return '#a10001'
-    elif -2.5 <= pixelValue < -2.25:
-        return '#ca0000'
-    elif -2.25 <= pixelValue < -2.0:
-        return '#e50201'
-    elif -2.0 <= pixelValue < -1.75:
-        return '#f41f0a'
-    elif -1.75 <= pixelValue < -1.5:
-        return '#f1651d'
-    elif -1.5 <= pixelValue < -1.25:
-        return '#ed9028'
-    elif -1.25 <= pixelValue < -1.0:
-        return '#e9aa2d'
-    elif -1.0 <= pixelValue < -0.75:
-        return '#dfbf77'
-    elif -0.75 <= pixelValue < -0.25:
-        return '#c8c8c8'  # Gris para valores cercanos a -0.25
-    elif -0.25 <= pixelValue < 0.25:
-        return '#c8c8c8'  # Gris para el rango de -0.25 a 0.25
-    elif 0.25 <= pixelValue < 0.5:
-        return '#54ba57'
-    elif 0.5 <= pixelValue < 0.75:
-        return '#009e3c'
-    elif 0.75 <= pixelValue < 1.0:
-        return '#00a1df'
-    elif 1.0 <= pixelValue < 1.25:
-        return '#00b0df'
-    elif 1.25 <= pixelValue < 1.5:
-        return '#00b8e0'
-    elif 1.5 <= pixelValue < 1.75:
-        return '#009fdf'
-    elif 1.75 <= pixelValue < 2.0:
-        return '#007cdf'
-    elif 2.0 <= pixelValue < 2.25:
-        return '#0062df'
-    elif 2.25 <= pixelValue < 2.5:
-        return '#7100d0'
-    elif 2.5 <= pixelValue < 2.75:
-        return '#8900b0'
-    elif 2.75 <= pixelValue <= 10.0:
-        return '#a00090'
-    else:
-        return "none"
+    if not full:
+        update_data(glw, dataset, comids, export_csv)
+        return
+    data = glw.get_data(ds=dataset, comids=comids, workers=DOWNLOAD_WORKERS, 
+                        chunk_aligned=True)
+    save_historical(glw, data, export_csv)
+
+
+def update_data(glw, dataset, comids, export_csv=False):
+    """Download again the last month stored for each COMID, which may have
+    been only partly simulated, and the months after it."""
+    data = glw.update_data(ds=dataset, comids=comids, dir_path=OUT_PATH,
+                           workers=DOWNLOAD_WORKERS)
+    save_historical(glw, data, export_csv)
+
+
+def save_historical(glw, data, export_csv=False):
+    """Save the historical data, optionally also as the legacy CSV files."""
+    glw.save_data(data=data, save_type="columnar", dir_path=OUT_PATH)
+    glw.save_data(data=data, save_type="memmap", dir_path=OUT_PATH)
+    if export_csv:
+        glw.save_data(data=data, save_type="individual", dir_path=OUT_PATH)
+        glw.save_format_data(data=data, save_type="individual", dir_path=OUT_PATH_FORMATED)
+
 
+def report_download(glw):
+    """Print the zarr chunks and bytes needed to download the COMIDs."""
+    dataset = glw.get_bucket()
+    report = glw.dry_run(ds=dataset, csv=COMIDS_PATH, batch_size=BATCH_SIZE)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+def load_cube(glw):
+    """Open the memory-mapped historical cube, building it if needed."""
+    if not os.path.exists(os.path.join(OUT_PATH, "historical_simulation.json")):
+        data = glw.read_data(dir_path=OUT_PATH)
+        glw.save_data(data=data, save_type="memmap", dir_path=OUT_PATH)
+    return glw.open_cube(dir_path=OUT_PATH)
+
+
+def compute_sdi(metadata, cube=None, climatology=None, engine="numpy", refit=False):
+    """Compute the Streamflow Drought Index for each COMID, either from the
+    whole record (with the given Nalbantis engine) or from cached
+    climatology statistics updated with the new months only (built again
+    if refit, e.g. after a full download)."""
+    if cube is None:
+        cube = load_cube(Geoglows())
+    values, comids, dates = cube
+
+    if climatology is None:
+        # Compute the Nalbantis index for all the COMIDs at once
+        nlb = Nalbantis(engine=engine)
+        latest, has_data = nlb.compute_latest_array(values, dates.month.to_numpy())
+    else:
+        climatology.load()
+        climatology.update_cube(values, comids, dates, refit=refit)
+        climatology.save()
+        latest, has_data = climatology.compute_latest()
+    sdi = pd.DataFrame(latest[has_data], index=pd.Index(comids[has_data], name="comid"),
+                       columns=["1", "3", "6", "9", "12"])
+    sdi = sdi[sdi.index.isin(metadata.comid)].round(3)
+    return sdi.reset_index()
+
+
+def generate_tifs(sdi_outputs, idw, multiband=False, date=DATE):
+    """Interpolate the SDI of every scale by IDW and save them as cloud
+    optimized GeoTIFF, either one file per scale or a single file with one
+    band per scale."""
+    _, tif_file, tif_files, _ = month_files(date)
+    values = sdi_outputs[["1", "3", "6", "9", "12"]].to_numpy()
+    grids = idw.interpolate(sdi_outputs.Lon.to_numpy(), sdi_outputs.Lat.to_numpy(), values)
+    grids, transform = idw.mask(grids, BOUNDARY)
+    if multiband:
+        descriptions = [f"SDI-{scale}" for scale in SCALES]
+        idw.save_tif(grids, transform, tif_file, descriptions=descriptions, cog=True)
+        return
+    for grid, tif_file in zip(grids, tif_files):
+        idw.save_tif(grid, transform, tif_file, cog=True)
 
 
-def plot_raster(raster_url: str, gdf: gpd.GeoDataFrame, fig_name: str, color: any, aggTime:str) -> None:
+def read_raster(raster_url: str, gdf: gpd.GeoDataFrame, outside: np.ndarray = None) -> tuple:
     """
-    Plots a raster based on a GeoDataFrame without reprojection or resampling.
+    Reads all the bands of a raster with a single open and windowed read.
 
     Parameters:
      - raster_url (str): Path to the input raster file.
      - gdf (GeoDataFrame): GeoDataFrame containing the geometries for masking.
-     - fig_name (str): Output figure file name.
-     - color (function): Function that returns a color based on a pixel value.
+     - outside (np.ndarray): Cached mask of the raster window, True outside
+       the geometries (the raster is masked with gdf if None).
+
+    Returns:
+     - tuple: The (band, row, column) masked array and its affine transform.
     """
     # Abre el raster utilizando rasterio
     with rasterio.open(raster_url) as src:
         # Leer los datos del raster
-        out_image_masked, out_transform = rasterio.mask.mask(
-            src, gdf.geometry, crop=True
-        )
-
-    # Convertir a un arreglo de float64
-    out_image_masked = out_image_masked.astype(np.float64)
-
-    # Reemplazar valores menores a -10 o mayores a 10 con NaN
-    out_image_masked = np.where((out_image_masked < -10) | (out_image_masked > 10), np.nan, out_image_masked)
-
-    # Asegurarse de que no haya valores NaN
-    out_image_masked = np.nan_to_num(out_image_masked, nan=np.nan)
-
-    # Encontrar valores mínimos y máximos
-    mmin = -3 #np.nanmin(out_image_masked)
-    mmax = 3 #np.nanmax(out_image_masked)
-
-    # Si mmin es igual a mmax, evitar crear linspace con un rango inválido
-    if mmin == mmax:
-        print("Los valores mínimos y máximos son iguales. No se puede crear linspace.")
-        return
-
-    # Crear una lista de valores entre 0 y 1
-    values = np.linspace(mmin, mmax, 500)  # Limitar a un máximo de 1000 colores
-
-    # Crear una lista de colores utilizando la función color
-    colors = [color(value) for value in values]
-    cmap_custom = ListedColormap(colors)
-
-    # Crea una figura de Matplotlib y muestra el raster enmascarado
-    fig, ax = plt.subplots(figsize=(8, 8))
-    plt.margins(0)
-
-    # Mostrar la imagen del raster usando imshow para obtener el mapeador
-    img = ax.imshow(out_image_masked[0], cmap=cmap_custom, extent=(
-        out_transform[2], 
-        out_transform[2] + out_transform[0] * out_image_masked.shape[2],
-        out_transform[5] + out_transform[4] * out_image_masked.shape[1], 
-        out_transform[5]
-    ), vmin=-3, vmax=3)
-
-    gdf.plot(ax=ax, color='none', edgecolor='black', linewidth=1)
+        if outside is None:
+            out_image_masked, out_transform = rasterio.mask.mask(
+                src, gdf.geometry, crop=True
+            )
+        else:
+            out_image_masked = src.read(masked=True).filled(np.nan)
+            out_image_masked[:, outside] = np.nan
+            out_transform = src.transform
+    return out_image_masked, out_transform
+
+
+def plot_raster(raster_url: str, gdf: gpd.GeoDataFrame, fig_name: str, palette: Palette, aggTime:str,
+                outside: np.ndarray = None) -> None:
+    """
+    Plots a raster based on a GeoDataFrame without reprojection or resampling.
 
-    # Establecer límites en los ejes x e y
-    plt.xlim(-73.75, -56.00)
-    plt.ylim(-23.50, -9.0)
+    Parameters:
+     - raster_url (str): Path to the input raster file.
+     - gdf (GeoDataFrame): GeoDataFrame containing the geometries for masking.
+     - fig_name (str): Output figure file name.
+     - palette (Palette): Colour table of the SDI classes.
+     - outside (np.ndarray): Cached mask of the raster window, True outside
+       the geometries (the raster is masked with gdf if None).
+    """
+    out_image_masked, out_transform = read_raster(raster_url, gdf, outside)
+    plot_image(out_image_masked[:1], out_transform, gdf, fig_name, palette, aggTime)
 
-    # Agregar la barra de color
-    fig.colorbar(img, ax=ax, label='', pad=0.05, shrink=0.5, extend='both', ticks=[-3.0, -2.5, -2.0, -1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3])
-    fd = DATE.strftime('%Y-%m')
-    plt.title(f"Índice hidrológico de sequía de Nalbantis: {aggTime} mes \nPeriodo: {fd}")
-    plt.draw()
-    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
 
-    # Guardar la figura
-    plt.savefig(fig_name, bbox_inches='tight', pad_inches=0)
+def plot_image(out_image_masked: np.ndarray, out_transform, gdf: gpd.GeoDataFrame,
+               fig_name: str, palette: Palette, aggTime: str) -> None:
+    """
+    Plots a (1, row, column) raster array already read from disk.
 
+    Parameters:
+     - out_image_masked (np.ndarray): The raster values.
+     - out_transform (Affine): The affine transform of the array.
+     - gdf (GeoDataFrame): GeoDataFrame containing the geometries to draw.
+     - fig_name (str): Output figure file name.
+     - palette (Palette): Colour table of the SDI classes.
+    """
+    template = FigureTemplate(palette, gdf, out_transform, out_image_masked.shape[1:],
+                              PLOT_XLIM, PLOT_YLIM)
+    template.save(out_image_masked[0], fig_name, title=plot_title(aggTime))
+    template.close()
+
+
+def plot_title(aggTime: str, date=DATE) -> str:
+    """Title of the map of one SDI scale."""
+    fd = date.strftime('%Y-%m')
+    return f"Índice hidrológico de sequía de Nalbantis: {aggTime} mes \nPeriodo: {fd}"
+
+
+def map_pool(idw, args):
+    """Build the pool that renders the PNG maps of a run, either directly as
+    RGBA images or with matplotlib figures for publication, in parallel
+    processes started once for every month. The boundary is simplified to
+    the map resolution."""
+    window, outside = idw.get_mask(BOUNDARY)
+    transform = idw.window_transform(window)
+    ec = BOUNDARY.for_resolution((PLOT_YLIM[1] - PLOT_YLIM[0]) / MAP_HEIGHT)
+    if args.publication:
+        return MapPool(FigureTemplate, (PALETTE, ec, transform, outside.shape, PLOT_XLIM, PLOT_YLIM),
+                       workers=args.plot_workers)
+    return MapPool(Renderer, (PALETTE, ec, transform, outside.shape),
+                   {'map_height': MAP_HEIGHT}, workers=args.plot_workers)
+
+
+def generate_pngs(gdf, outside, pool, multiband=False, date=DATE):
+    """Render the PNG map of every scale from the GeoTIFFs with the map
+    pool of the run."""
+    _, tif_file, tif_files, png_files = month_files(date)
+    if multiband:
+        bands, _ = read_raster(tif_file, gdf, outside)
+    else:
+        rasters = [read_raster(tif_file, gdf, outside) for tif_file in tif_files]
+        bands = np.concatenate([band for band, _ in rasters])
+    agg_times = ["01", "03", "06", "09", "12"]
 
-def main():
-    """Main function to execute the script."""
-    #clear_output_directories()
+    titles = [plot_title(aggTime, date) for aggTime in agg_times]
+    timings = pool.render(list(zip(bands, png_files, titles)))
+    for png_file, elapsed in zip(png_files, timings):
+        print(f"{png_file}: {elapsed:.2f} s")
 
-    # Instantiate Geoglows
-    glw = Geoglows()
 
-    # Download data and compute the SDI
-    print("Downloading")
-    #download_data(glw)
-    print("Downloaded")
+def load_metadata():
+    """Read the station names, coordinates and COMIDs."""
     metadata = pd.read_csv(COMIDS_PATH, sep=",")[["Clave", "Longitud", "Latitud", "comid"]]
     metadata.columns = ['Estacion', 'Lon', 'Lat', "comid"]
     metadata.comid = metadata.comid.astype(int)
-    sdi_outputs = compute_sdi(metadata)
     print(metadata)
+    return metadata
+
+
+def process(glw, args, cube=None):
+    """Compute the SDI from the historical data (the local cube, or another
+    one such as a shared regional store) and write the CSV, GeoTIFF and PNG
+    outputs."""
+    metadata = load_metadata()
+    cube = load_cube(glw) if cube is None else cube
+    climatology = None
+    if args.climatology:
+        climatology = Climatology(CACHE_DIR, reference=args.reference)
+    sdi_outputs = compute_sdi(metadata, cube, climatology, engine=args.engine, refit=args.full)
+    if args.archive:
+        SDIArchive(ARCHIVE_DIR).update(Nalbantis(engine=args.engine), *cube)
+    idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, cache_dir=CACHE_DIR)
+    with map_pool(idw, args) as pool:
+        write_outputs(metadata, sdi_outputs, args, idw, pool)
+
+
+def write_outputs(metadata, sdi_outputs, args, idw, pool, date=DATE):
+    """Write the CSV, GeoTIFF and PNG outputs of the SDI of one month, with
+    the interpolator and map pool of the run."""
+    csv_file = month_files(date)[0]
 
     # Merge metadata with SDI outputs and save to CSV
     sdi_outputs = pd.merge(metadata, sdi_outputs, on="comid")
     sdi_outputs = sdi_outputs.drop(columns=["comid"])
-    sdi_outputs.to_csv(OUTPUT_FILE, sep=",", index=False)
+    sdi_outputs.to_csv(csv_file, sep=",", index=False)
 
     # Create GeoTIFF
-    os.system(f'Rscript generate_tif.R {OUTPUT_FILE} {TIF01_FILE} "X1"')
-    os.system(f'Rscript generate_tif.R {OUTPUT_FILE} {TIF03_FILE} "X3"')
-    os.system(f'Rscript generate_tif.R {OUTPUT_FILE} {TIF06_FILE} "X6"')
-    os.system(f'Rscript generate_tif.R {OUTPUT_FILE} {TIF09_FILE} "X9"')
-    os.system(f'Rscript generate_tif.R {OUTPUT_FILE} {TIF12_FILE} "X12"')
+    generate_tifs(sdi_outputs, idw, multiband=args.multiband, date=date)
+    _, outside = idw.get_mask(BOUNDARY)
+
+    # Generate PNG plots, with the boundary simplified to the map resolution
+    ec = BOUNDARY.for_resolution((PLOT_YLIM[1] - PLOT_YLIM[0]) / MAP_HEIGHT)
+    generate_pngs(ec, outside, pool, multiband=args.multiband, date=date)
+
+
+def backfill(args):
+    """Write the outputs of every month of the SDI archive (or of the months
+    between --start and --end) without downloading, building the archive
+    from the historical data first if it is missing or --rebuild is given."""
+    archive = SDIArchive(ARCHIVE_DIR)
+    if args.rebuild or not archive.exists():
+        archive.build(Nalbantis(engine=args.engine), *load_cube(Geoglows()))
+    metadata = load_metadata()
+    idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, cache_dir=CACHE_DIR)
+    dates = archive.dates[(archive.dates >= (args.start or archive.dates.min())) &
+                          (archive.dates <= (args.end or archive.dates.max()))]
+    with map_pool(idw, args) as pool:
+        for date in dates:
+            sdi_outputs = archive.month(date).round(3).reset_index()
+            if sdi_outputs.empty:
+                continue
+            print(f"Backfilling {date.strftime('%Y-%m')}")
+            write_outputs(metadata, sdi_outputs, args, idw, pool, date=date)
+
+
+def read_rivers(path):
+    """Read the coordinates of the GEOGLOWS rivers (a CSV or parquet table
+    with LINKNO or rivid, lon and lat columns)."""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def gridded(args):
+    """Compute the latest SDI of every GEOGLOWS river inside the grid
+    extent, block by block, resuming from the last checkpoint."""
+    glw = Geoglows()
+    dataset = glw.get_bucket()
+    grid = GriddedSDI(GRIDDED_DIR, x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE)
+    rivers = None if args.rivers is None else read_rivers(args.rivers)
+    rivers = grid.select_rivers(dataset, rivers)
+    grid.run(glw, dataset, Nalbantis(engine=args.engine), rivers, block_size=args.block_size,
+             workers=DOWNLOAD_WORKERS, restart=args.restart)
+    print(f"Gridded SDI saved in {grid.path}")
+
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Streamflow drought monitor")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report the chunks and bytes to download")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild the historical data from scratch")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="also save the historical data as CSV/TSV files")
+    parser.add_argument("--multiband", action="store_true",
+                        help="save a single GeoTIFF with one band per SDI scale")
+    parser.add_argument("--publication", action="store_true",
+                        help="render the PNG maps with matplotlib figures")
+    parser.add_argument("--plot-workers", type=int, default=PLOT_WORKERS,
+                        help="number of PNG maps rendered concurrently")
+    parser.add_argument("--archive", action="store_true",
+                        help="also write the new and revised months to the SDI archive")
+    parser.add_argument("--engine", choices=["numpy", "numba", "auto"], default="numpy",
+                        help="how the SDI arrays are computed (numba compiles on every run)")
+    parser.add_argument("--climatology", action="store_true",
+                        help="update cached monthly statistics instead of recomputing them")
+    parser.add_argument("--reference", nargs=2, metavar=("START", "END"),
+                        help="freeze the climatology to a reference period (e.g. 1991-01 2020-12)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="write the outputs of past months from the SDI archive")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="compute the whole SDI archive again before --backfill")
+    parser.add_argument("--start", type=pd.Timestamp,
+                        help="first month to backfill (YYYY-MM)")
+    parser.add_argument("--end", type=pd.Timestamp,
+                        help="last month to backfill (YYYY-MM)")
+    parser.add_argument("--gridded", action="store_true",
+                        help="compute the SDI of every GEOGLOWS river inside the grid extent")
+    parser.add_argument("--rivers",
+                        help="table with the coordinates of the rivers (LINKNO, lon, lat)")
+    parser.add_argument("--block-size", type=int, default=2000,
+                        help="number of rivers downloaded and computed together")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint of an interrupted gridded run")
+    args = parser.parse_args()
+    if args.rebuild and not args.backfill:
+        parser.error("--rebuild requires --backfill")
+    if args.reference and not args.climatology:
+        parser.error("--reference requires --climatology")
+    return args
+
+
+def main(args):
+    """Main function to execute the script."""
+    if args.dry_run:
+        report_download(Geoglows())
+        return
+    if args.backfill:
+        for dir_path in [PNG_DIR, TIF_DIR, TXT_DIR, ARCHIVE_DIR]:
+            os.makedirs(dir_path, exist_ok=True)
+        backfill(args)
+        return
+    if args.gridded:
+        gridded(args)
+        return
+
+    #clear_output_directories(full=args.full)
+
+    # Instantiate Geoglows
+    glw = Geoglows()
 
-    # Generate PNG plots
-    ec = gpd.read_file("assets/bolivia.shp")
-    plot_raster(raster_url=TIF01_FILE, gdf=ec, fig_name=PNG01_FILE, color=color, aggTime="01")
-    plot_raster(raster_url=TIF03_FILE, gdf=ec, fig_name=PNG03_FILE, color=color, aggTime="03")
-    plot_raster( raster_url=TIF06_FILE, gdf=ec, fig_name=PNG06_FILE, color=color, aggTime="06")
-    plot_raster(raster_url=TIF09_FILE, gdf=ec, fig_name=PNG09_FILE, color=color, aggTime="09")
-    plot_raster(raster_url=TIF12_FILE, gdf=ec, fig_name=PNG12_FILE, color=color, aggTime="12")
+    # Download data and compute the SDI
+    print("Downloading")
+    #download_data(glw, full=args.full, export_csv=args.export_csv)
+    print("Downloaded")
+    process(glw, args)
 
 
 
 if __name__ == "__main__":
-    main()
+    main(parse_args())
@@ -0,0 +1,5 @@
+"""
+Modules shared by the national pipelines (bolivia/, chile/, ...) and the
+regional orchestrator: GEOGLOWS download, SDI computation, interpolation,
+archive and rendering.
+"""
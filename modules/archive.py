@@ -0,0 +1,255 @@
+import os
+import zlib
+import shutil
+import zarr
+import numpy as np
+import pandas as pd
+
+# SDI scales (months) along the last axis, in the order of Nalbantis
+SCALES = [1, 3, 6, 9, 12]
+
+# Zarr group of the archive, inside its directory
+ARCHIVE_FILE = 'sdi_archive.zarr'
+
+# Chunk shape of the (month, comid, scale) array: a point query reads one
+# chunk, a station series a few and a month slice one row of chunks
+ARCHIVE_CHUNKS = (60, 256, len(SCALES))
+
+class SDIArchive:
+    """
+    A class for keeping the SDI of every month, station and scale in a
+    (month, comid, scale) zarr array, so that past months and station time
+    series are read back instead of recomputed.
+    """
+
+    def __init__(self, dir_path: str) -> None:
+        """
+        Initializes the SDIArchive object. Nothing is read until queried.
+
+        Args:
+            dir_path (str): The directory where the archive is stored.
+        """
+        self.path = os.path.join(dir_path, ARCHIVE_FILE)
+        self._group = None
+        self._comids = None
+        self._dates = None
+
+    def exists(self) -> bool:
+        """
+        Returns True if the archive has been built.
+        """
+        try:
+            zarr.open_group(self.path, mode='r')
+        except (FileNotFoundError, ValueError):
+            return False
+        return True
+
+    def build(self, nalbantis, values: np.ndarray, comids: np.ndarray,
+              dates: pd.DatetimeIndex, block_size: int = 2000) -> None:
+        """
+        Computes the SDI of every month of a (time, station) streamflow
+        array, as compute_overall does for one station (each scale on its
+        own with Nalbantis(per_scale=True)), and replaces the archive with it.
+
+        Args:
+            nalbantis (Nalbantis): Computes the SDI of each block.
+            values (np.ndarray): A (time, station) array of monthly
+                                 streamflow values (e.g. the np.memmap of
+                                 Geoglows.open_cube, read block by block).
+            comids (np.ndarray): The COMID of each column.
+            dates (pd.DatetimeIndex): The month of each row.
+            block_size (int): Number of stations computed and written
+                              together.
+        """
+        dates = pd.DatetimeIndex(dates)
+        months = dates.month.to_numpy()
+
+        # Written next to the archive and moved in place when complete
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        group = zarr.open_group(tmp_path, mode='w')
+        sdi = group.create_dataset(
+            'sdi', shape=(len(dates), len(comids), len(SCALES)), dtype=np.float32,
+            chunks=ARCHIVE_CHUNKS, fill_value=np.nan)
+        sdi.attrs['_ARRAY_DIMENSIONS'] = ['time', 'comid', 'scale']
+        for name, data in [('time', dates.values.astype('datetime64[ns]')),
+                           ('comid', np.asarray(comids, dtype=np.int64)),
+                           ('scale', np.asarray(SCALES, dtype=np.int64))]:
+            group.array(name, data, chunks=len(data) or 1)
+            group[name].attrs['_ARRAY_DIMENSIONS'] = [name]
+
+        # Checksum of the streamflow of each month, to find revised months
+        checksums = self._checksums(values)
+        group.array('checksum', checksums, chunks=len(checksums) or 1)
+        group['checksum'].attrs['_ARRAY_DIMENSIONS'] = ['time']
+
+        # Blocks aligned with the chunks, so each chunk is written once
+        block_size = max(block_size // ARCHIVE_CHUNKS[1], 1) * ARCHIVE_CHUNKS[1]
+        for start in range(0, len(comids), block_size):
+            block = slice(start, start + block_size)
+            values_block = nalbantis.compute_array(values[:, block], months)
+            sdi[:, block, :] = np.moveaxis(values_block, 0, -1).astype(np.float32)
+
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(tmp_path, self.path)
+        self._group = self._comids = self._dates = None
+
+    def update(self, nalbantis, values: np.ndarray, comids: np.ndarray,
+               dates: pd.DatetimeIndex, block_size: int = 2000) -> int:
+        """
+        Writes the months of a (time, station) streamflow array from the
+        first one that is new or whose streamflow was revised (e.g. a partial
+        month refetched), each with the SDI of the record up to it, so the
+        other months keep the values they were published with. The archive
+        is built again if it is missing, has no checksums, the stations
+        changed or its months are not the first ones of the record.
+
+        Args:
+            nalbantis (Nalbantis): Computes the SDI of each block.
+            values (np.ndarray): A (time, station) array of monthly
+                                 streamflow values.
+            comids (np.ndarray): The COMID of each column.
+            dates (pd.DatetimeIndex): The month of each row.
+            block_size (int): Number of stations computed and written
+                              together.
+
+        Returns:
+            int: The number of months written (all of them if rebuilt).
+        """
+        dates = pd.DatetimeIndex(dates)
+        if (not self.exists() or 'checksum' not in self.group
+                or not np.array_equal(self.comids, comids)
+                or not self.dates.equals(dates[:len(self.dates)])):
+            self.build(nalbantis, values, comids, dates, block_size=block_size)
+            return len(dates)
+
+        # First month that is new or was revised since it was archived
+        checksums = self._checksums(values)
+        archived = self.group['checksum'][:]
+        revised = np.flatnonzero(archived != checksums[:len(archived)])
+        first = int(revised[0]) if len(revised) else len(archived)
+        if first == len(dates):
+            return 0
+        months = dates.month.to_numpy()
+
+        group = zarr.open_group(self.path, mode='r+')
+        sdi = group['sdi']
+        sdi.resize(len(dates), len(comids), len(SCALES))
+        for name, data in [('time', dates.values.astype('datetime64[ns]')),
+                           ('checksum', checksums)]:
+            group[name].resize(len(dates))
+            group[name][first:] = data[first:]
+
+        # Blocks aligned with the chunks, each month standardized with the
+        # statistics of the record up to it
+        block_size = max(block_size // ARCHIVE_CHUNKS[1], 1) * ARCHIVE_CHUNKS[1]
+        for start in range(0, len(comids), block_size):
+            block = slice(start, start + block_size)
+            rows = [nalbantis.compute_array(values[:end, block], months[:end])[:, -1]
+                    for end in range(first + 1, len(dates) + 1)]
+            sdi[first:, block, :] = np.moveaxis(np.stack(rows, axis=1), 0, -1).astype(np.float32)
+        self._group = self._comids = self._dates = None
+        return len(dates) - first
+
+    def _checksums(self, values: np.ndarray) -> np.ndarray:
+        """
+        A CRC-32 of the streamflow of each month (row) of a record.
+        """
+        return np.array([zlib.crc32(np.ascontiguousarray(row, dtype=np.float64).tobytes())
+                         for row in values], dtype=np.uint32)
+
+    @property
+    def group(self) -> zarr.Group:
+        """
+        The zarr group, opened read-only on first use.
+        """
+        if self._group is None:
+            if not self.exists():
+                raise FileNotFoundError(f"No SDI archive in {self.path}.")
+            self._group = zarr.open_group(self.path, mode='r')
+        return self._group
+
+    @property
+    def comids(self) -> np.ndarray:
+        """
+        The COMIDs of the archive, in column order.
+        """
+        if self._comids is None:
+            self._comids = self.group['comid'][:]
+        return self._comids
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """
+        The months of the archive.
+        """
+        if self._dates is None:
+            self._dates = pd.DatetimeIndex(self.group['time'][:], name='time')
+        return self._dates
+
+    def _column(self, comid: int) -> int:
+        """
+        Position of a COMID in the archive.
+        """
+        column = np.flatnonzero(self.comids == comid)
+        if len(column) == 0:
+            raise KeyError(f"COMID {comid} is not in the SDI archive.")
+        return int(column[0])
+
+    def _row(self, date) -> int:
+        """
+        Position of a month in the archive.
+        """
+        date = pd.Timestamp(date).to_period('M').to_timestamp()
+        row = self.dates.get_indexer([date])[0]
+        if row < 0:
+            raise KeyError(f"{date:%Y-%m} is not in the SDI archive.")
+        return int(row)
+
+    def point(self, comid: int, date) -> pd.Series:
+        """
+        Reads the SDI of one station and month.
+
+        Args:
+            comid (int): The COMID of the station.
+            date: Any date of the month.
+
+        Returns:
+            pd.Series: The SDI of each scale, indexed by '1', '3', ...
+        """
+        values = self.group['sdi'][self._row(date), self._column(comid), :]
+        return pd.Series(values, index=[str(scale) for scale in SCALES], name=comid)
+
+    def station(self, comid: int) -> pd.DataFrame:
+        """
+        Reads the SDI time series of one station.
+
+        Args:
+            comid (int): The COMID of the station.
+
+        Returns:
+            pd.DataFrame: The SDI of each scale (columns '1', '3', ...) by
+            month, from the first month with all the scales available.
+        """
+        values = self.group['sdi'][:, self._column(comid), :]
+        series = pd.DataFrame(values, index=self.dates,
+                              columns=[str(scale) for scale in SCALES])
+        return series.dropna(how='all')
+
+    def month(self, date) -> pd.DataFrame:
+        """
+        Reads the SDI of every station in one month.
+
+        Args:
+            date: Any date of the month.
+
+        Returns:
+            pd.DataFrame: The SDI of each scale (columns '1', '3', ...) by
+            COMID, without the stations that have no value that month.
+        """
+        values = self.group['sdi'][self._row(date), :, :]
+        sdi = pd.DataFrame(values, index=pd.Index(self.comids, name='comid'),
+                           columns=[str(scale) for scale in SCALES])
+        return sdi.dropna(how='all')
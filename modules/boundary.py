@@ -0,0 +1,126 @@
+import os
+import hashlib
+import shapely
+import pandas as pd
+import geopandas as gpd
+import pyarrow.parquet as pq
+
+# Simplification tolerances (degrees) of the cached levels of detail, the
+# first one being the original geometry
+TOLERANCES = [0.0, 0.001, 0.005, 0.02]
+
+class Boundary:
+    """
+    A class for caching a country shapefile as GeoParquet, in longitude/
+    latitude and at several levels of detail, so that each output reads
+    only the vertices it can draw.
+    """
+
+    def __init__(self, shapefile: str, cache_dir: str = None,
+                 tolerances: list = TOLERANCES) -> None:
+        """
+        Initializes the Boundary object. Nothing is read until a level of
+        detail is requested.
+
+        Args:
+            shapefile (str): Path to the shapefile.
+            cache_dir (str): Directory where the GeoParquet file is stored
+                             between runs (not cached if None).
+            tolerances (list): Increasing simplification tolerances, in
+                               degrees, starting with 0 (original geometry).
+        """
+        self.shapefile = shapefile
+        self.cache_dir = cache_dir
+        self.tolerances = list(tolerances)
+        self.levels = {}
+        self._key = None
+
+    @property
+    def key(self) -> str:
+        """
+        SHA-1 of the shapefile geometry (.shp) and projection (.prj).
+        """
+        if self._key is None:
+            digest = hashlib.sha1()
+            for ext in ['.shp', '.prj']:
+                sidecar = os.path.splitext(self.shapefile)[0] + ext
+                if os.path.exists(sidecar):
+                    with open(sidecar, 'rb') as f:
+                        digest.update(f.read())
+            digest.update(repr(self.tolerances).encode())
+            self._key = digest.hexdigest()
+        return self._key
+
+    def _build(self) -> gpd.GeoDataFrame:
+        """
+        Reads the shapefile, projects it to EPSG:4326 and simplifies it at
+        every tolerance.
+        """
+        gdf = gpd.read_file(self.shapefile)
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(epsg=4326)
+        gdf = gdf[['geometry']]
+        levels = []
+        for tolerance in self.tolerances:
+            level = gdf.copy()
+            if tolerance > 0:
+                level['geometry'] = gdf.geometry.simplify(tolerance, preserve_topology=True)
+            level['tolerance'] = tolerance
+            levels.append(level)
+        return gpd.GeoDataFrame(
+            pd.concat(levels, ignore_index=True), geometry='geometry', crs=gdf.crs)
+
+    def get(self, tolerance: float) -> gpd.GeoDataFrame:
+        """
+        Returns the geometries at one level of detail, building and caching
+        all the levels on first use.
+
+        Args:
+            tolerance (float): One of the cached tolerances.
+
+        Returns:
+            gpd.GeoDataFrame: The geometries at that level of detail.
+        """
+        if tolerance not in self.tolerances:
+            raise ValueError(f"No level of detail with tolerance {tolerance}.")
+        if tolerance in self.levels:
+            return self.levels[tolerance]
+
+        if self.cache_dir is None:
+            levels = self._build()
+        else:
+            path = os.path.join(self.cache_dir, f"boundary_{self.key}.parquet")
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                levels = self._build()
+                # One row group per level, so a level is read on its own
+                row_group_size = int((levels.tolerance == 0).sum())
+                levels.to_parquet(tmp_path, index=False, row_group_size=row_group_size)
+                os.replace(tmp_path, path)
+            # The geometries are always in EPSG:4326, so the WKB is decoded
+            # directly instead of parsing the GeoParquet CRS metadata
+            table = pq.read_table(path, filters=[('tolerance', '==', tolerance)])
+            levels = gpd.GeoDataFrame(
+                {'tolerance': table['tolerance'].to_numpy()},
+                geometry=shapely.from_wkb(table['geometry'].to_numpy(zero_copy_only=False)),
+                crs='EPSG:4326')
+
+        level = levels[levels.tolerance == tolerance].reset_index(drop=True)
+        self.levels[tolerance] = level
+        return level
+
+    def for_resolution(self, pixel_size: float) -> gpd.GeoDataFrame:
+        """
+        Returns the coarsest level of detail whose tolerance is at most half
+        an output pixel, so the simplification is not visible.
+
+        Args:
+            pixel_size (float): The output pixel size in degrees (0 for the
+                                original geometry).
+
+        Returns:
+            gpd.GeoDataFrame: The geometries at that level of detail.
+        """
+        tolerance = max(t for t in self.tolerances if t <= pixel_size / 2)
+        return self.get(tolerance)
@@ -0,0 +1,230 @@
+import os
+import zlib
+import numpy as np
+import pandas as pd
+from .nalbantis import RollingMeans
+
+# SDI scales (months) of the statistics, in the order of Nalbantis
+SCALES = [1, 3, 6, 9, 12]
+
+# Cached statistics, inside the cache directory
+CLIMATOLOGY_FILE = 'climatology.npz'
+
+# Last months of the record whose values are checked before an update, so
+# that revised months (e.g. refetched) are not kept in the statistics
+FINGERPRINT_MONTHS = 12
+
+class Climatology:
+    """
+    A class for keeping the per-station, per-calendar-month and per-scale
+    count, mean and sum of squared deviations of the rolling mean
+    streamflow, updated one month at a time (Welford's algorithm), so that
+    the latest SDI is computed without reducing the whole record again.
+    """
+
+    def __init__(self, dir_path: str = None, reference: tuple = None,
+                 per_scale: bool = False) -> None:
+        """
+        Initializes the Climatology object.
+
+        Args:
+            dir_path (str): Directory where the statistics are stored between
+                            runs (not stored if None).
+            reference (tuple): The first and last dates (e.g. ('1991-01',
+                               '2020-12')) of a fixed reference period, so
+                               that later months no longer change the
+                               statistics (every month is used if None).
+            per_scale (bool): If True, each scale is valid where its rolling
+                              mean is, as Nalbantis(per_scale=True) does. By
+                              default a month is valid only where the
+                              12-month mean is.
+        """
+        self.path = None if dir_path is None else os.path.join(dir_path, CLIMATOLOGY_FILE)
+        self.reference = None if reference is None else (
+            pd.Timestamp(reference[0]).to_period('M').to_timestamp(),
+            pd.Timestamp(reference[1]).to_period('M').to_timestamp())
+        self.per_scale = per_scale
+        self.comids = None
+        self.last_date = None
+        self.fingerprint = None
+
+    def reset(self, comids: np.ndarray) -> None:
+        """
+        Empties the statistics for a set of stations.
+
+        Args:
+            comids (np.ndarray): The COMID of each station.
+        """
+        n_stations = len(comids)
+        self.comids = np.asarray(comids, dtype=np.int64)
+        self.last_date = None
+        self.fingerprint = None
+        self.count = np.zeros((12, n_stations, len(SCALES)), dtype=np.int64)
+        self.mean = np.zeros((12, n_stations, len(SCALES)))
+        self.m2 = np.zeros((12, n_stations, len(SCALES)))
+
+        # Keeps the last 11 months of streamflow, for the rolling means of new months
+        self.rolling = RollingMeans(n_stations)
+
+        # Rolling means and calendar month of the last valid row of each
+        # station (with per_scale, NaN in the scales that are not valid)
+        self.latest = np.full((n_stations, len(SCALES)), np.nan)
+        self.latest_month = np.zeros(n_stations, dtype=np.int64)
+
+    def update(self, values: np.ndarray, date) -> None:
+        """
+        Adds one month of streamflow of every station.
+
+        Args:
+            values (np.ndarray): A (station,) array of monthly streamflow.
+            date: The month of the values, just after the last one added.
+        """
+        date = pd.Timestamp(date).to_period('M').to_timestamp()
+        if self.last_date is not None and date != self.last_date + pd.DateOffset(months=1):
+            raise ValueError(f"{date:%Y-%m} does not follow {self.last_date:%Y-%m}.")
+        means = self.rolling.update(values)[:, 0].T
+        self.last_date = date
+
+        # As in Nalbantis, a row is valid when all the rolling means are,
+        # or each scale when its own is if per_scale
+        if self.per_scale:
+            valid = np.isfinite(means)
+        else:
+            valid = np.repeat(np.isfinite(means[:, -1:]), len(SCALES), axis=1)
+        current = valid.any(axis=1)
+        self.latest[current] = means[current]
+        self.latest_month[current] = date.month
+        if self.reference is not None and not self.reference[0] <= date <= self.reference[1]:
+            return
+
+        month = date.month - 1
+        self.count[month][valid] += 1
+        delta = means[valid] - self.mean[month][valid]
+        self.mean[month][valid] += delta / self.count[month][valid]
+        self.m2[month][valid] += delta * (means[valid] - self.mean[month][valid])
+
+    def fit(self, values: np.ndarray, comids: np.ndarray, dates: pd.DatetimeIndex) -> None:
+        """
+        Builds the statistics from a whole (time, station) record.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly
+                                 streamflow values (e.g. the np.memmap of
+                                 Geoglows.open_cube).
+            comids (np.ndarray): The COMID of each column.
+            dates (pd.DatetimeIndex): The month of each row.
+        """
+        dates = pd.DatetimeIndex(dates)
+        self.reset(comids)
+        for row, date in enumerate(dates):
+            self.update(values[row], date)
+        self.fingerprint = self._fingerprint(values, dates)
+
+    def _fingerprint(self, values: np.ndarray, dates: pd.DatetimeIndex) -> int:
+        """
+        A CRC-32 of the last months of a record up to the last month added.
+        """
+        end = dates.get_loc(self.last_date) + 1
+        rows = np.asarray(values[max(end - FINGERPRINT_MONTHS, 0):end], dtype=np.float64)
+        return zlib.crc32(np.ascontiguousarray(rows).tobytes())
+
+    def update_cube(self, values: np.ndarray, comids: np.ndarray,
+                    dates: pd.DatetimeIndex, refit: bool = False) -> int:
+        """
+        Adds the months of a record after the last one added, or builds the
+        statistics again if the stations changed, the last month added is
+        not in the record or the last months added were revised since.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly
+                                 streamflow values.
+            comids (np.ndarray): The COMID of each column.
+            dates (pd.DatetimeIndex): The month of each row.
+            refit (bool): If True, the statistics are built again anyway
+                          (e.g. after the whole record was downloaded again).
+
+        Returns:
+            int: The number of months added (all of them if rebuilt).
+        """
+        dates = pd.DatetimeIndex(dates)
+        if (refit or self.comids is None or not np.array_equal(self.comids, comids)
+                or self.last_date not in dates
+                or self._fingerprint(values, dates) != self.fingerprint):
+            self.fit(values, comids, dates)
+            return len(dates)
+        start = dates.get_loc(self.last_date) + 1
+        for row in range(start, len(dates)):
+            self.update(values[row], dates[row])
+        self.fingerprint = self._fingerprint(values, dates)
+        return len(dates) - start
+
+    def compute_latest(self) -> tuple:
+        """
+        Standardizes the rolling means of the last valid row of each station
+        with the statistics of its calendar month.
+
+        Returns:
+            tuple: A (station, scale) array with the latest SDI values (with
+            per_scale, NaN in the scales whose window is incomplete), and a
+            (station,) boolean array that is False for the stations without
+            any valid row.
+        """
+        has_data = self.latest_month > 0
+        month = np.maximum(self.latest_month, 1) - 1
+        stations = np.arange(len(month))
+        count = self.count[month, stations]
+        mean = self.mean[month, stations]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2[month, stations] / (count - 1))
+            latest = (self.latest - mean) / std
+        latest[~has_data] = np.nan
+        return latest, has_data
+
+    def _reference_key(self) -> np.ndarray:
+        """
+        The reference period as an array, empty if there is none.
+        """
+        if self.reference is None:
+            return np.array([], dtype='datetime64[ns]')
+        return np.array(self.reference, dtype='datetime64[ns]')
+
+    def save(self) -> None:
+        """
+        Writes the statistics to the cache directory.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, comids=self.comids, count=self.count, mean=self.mean, m2=self.m2,
+                 tail=self.rolling.tail, latest=self.latest, latest_month=self.latest_month,
+                 last_date=np.datetime64(self.last_date, 'ns'), fingerprint=self.fingerprint,
+                 reference=self._reference_key(), per_scale=self.per_scale)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """
+        Reads the statistics from the cache directory, unless there are none
+        or they were computed for another reference period or validity.
+
+        Returns:
+            bool: True if the statistics were read.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as cached:
+            if not np.array_equal(cached['reference'], self._reference_key()):
+                return False
+            # Caches with a single count for all the scales, or without the
+            # fingerprint of the last months or the validity, are computed again
+            if (cached['count'].ndim != 3 or 'fingerprint' not in cached
+                    or 'per_scale' not in cached or bool(cached['per_scale']) != self.per_scale):
+                return False
+            self.comids = cached['comids']
+            self.count = cached['count']
+            self.mean = cached['mean']
+            self.m2 = cached['m2']
+            self.rolling = RollingMeans(len(self.comids), cached['tail'])
+            self.latest = cached['latest']
+            self.latest_month = cached['latest_month']
+            self.last_date = pd.Timestamp(cached['last_date'].item())
+            self.fingerprint = int(cached['fingerprint'])
+        return True
@@ -0,0 +1,549 @@
+import os
+import json
+import time
+import s3fs
+import xarray as xr
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# First month of the historical record used by the monitor
+START_DATE = '1991-01-01'
+
+# Single-file (time x comid) historical store
+COLUMNAR_FILE = 'historical_simulation.parquet'
+
+# Memory-mapped float32 (month x comid) cube and its sidecar index
+CUBE_FILE = 'historical_simulation.f32'
+CUBE_INDEX = 'historical_simulation.json'
+
+class Geoglows:
+    """
+    A class for downloading and managing streamflow data from the ECMWF global 
+    hydrological model (GEOGLOWS).
+    """
+
+    def __init__(self, store=None) -> None:
+        """
+        Initializes the Geoglows object by setting up the connection to the S3
+        bucket containing the GEOGLOWS retrospective simulation dataset.
+
+        Args:
+            store (optional): A zarr store (path or mapping) to use instead of
+                              the S3 bucket, e.g. a local copy for testing.
+        """
+        self.s3store = self._initialize_s3store() if store is None else store
+        self.batch_times = []
+        self.batch_bytes = []
+
+    def _initialize_s3store(self) -> s3fs.S3Map:
+        """
+        Initializes the S3 store for accessing the GEOGLOWS dataset.
+
+        Returns:
+            s3fs.S3Map: An S3Map object that links to the specified GEOGLOWS 
+                        dataset.
+        """
+        params = {'region_name': 'us-west-2'}
+        url = 's3://geoglows-v2-retrospective/retrospective.zarr'
+        s3 = s3fs.S3FileSystem(anon=True, client_kwargs=params)
+        return s3fs.S3Map(root=url, s3=s3, check=False)
+
+    def get_bucket(self) -> xr.Dataset:
+        """
+        Opens and retrieves the GEOGLOWS dataset from the S3 bucket.
+
+        Returns:
+            xarray.Dataset: The GEOGLOWS retrospective dataset.
+        """
+        return xr.open_zarr(self.s3store)
+
+    def verify_comids(self, ds: xr.Dataset, csv: str) -> list:
+        """
+        Verifies which COMIDs (Catchment Object Identifiers) are available 
+        both in the dataset and in the provided CSV file.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing river IDs.
+            csv (str): The path to the CSV file containing the list of 
+                       COMIDs to check.
+
+        Returns:
+            list: A list of COMIDs that are present both in the dataset and
+                  in the CSV file.
+        """
+        ds_comids = set(ds.rivid.values)
+        ec_comids = set(pd.read_csv(csv)['comid'])
+        return list(ds_comids.intersection(ec_comids))
+
+    def get_data(self, ds: xr.Dataset, comids: list, batch_size: int = 100, 
+                 workers: int = 1, chunk_aligned: bool = False, 
+                 start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """
+        Retrieves and structures streamflow data for the specified COMIDs.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+            comids (list): A list of COMIDs to extract data for.
+            batch_size (int): Number of COMIDs extracted in each batch (all 
+                              of them at once if None).
+            workers (int): Number of batches extracted concurrently.
+            chunk_aligned (bool): If True, the COMIDs are grouped by the zarr 
+                                  chunk they live in and each chunk is read
+                                  once, ignoring batch_size.
+            start_date (str): First month to download (START_DATE if None),
+                              e.g. a later one for incremental updates.
+            end_date (str): Last month to download (the previous month if 
+                            None).
+
+        Returns:
+            pd.DataFrame: A DataFrame where each column represents the streamflow
+            data for a specific COMID, indexed by time.
+        """
+        comids = list(np.atleast_1d(comids))
+        if not comids:
+            self.batch_times, self.batch_bytes = [], []
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='time'),
+                                columns=pd.Index([], name='rivid'), dtype=ds['Qout'].dtype)
+        positions = self.get_positions(ds, comids)
+        batches = self.plan_batches(ds, positions, batch_size, chunk_aligned)
+        self.batch_times = [None] * len(batches)
+
+        # Select the time window lazily, before any chunk is fetched
+        start_date, end_date, last_day = self.get_window(start_date, end_date)
+        qout = ds['Qout'].sel(time=slice(start_date, last_day))
+
+        # Bytes read by each batch, with and without the time window
+        time_range = ds.indexes['time'].slice_locs(start_date, last_day)
+        self.batch_bytes = [
+            (self.read_bytes(ds, positions[batch], time_range), 
+             self.read_bytes(ds, positions[batch])) for batch in batches]
+
+        # Process COMIDs in batches, several at once
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda args: self._get_batch(qout, args[0], positions[args[1]]), 
+                enumerate(batches)))
+
+        # Scatter the batch results back to the original COMID order
+        months = results[0][0]
+        values = np.empty((len(months), len(comids)), dtype=results[0][1].dtype)
+        for batch, (_, monthly) in zip(batches, results):
+            values[:, batch] = monthly
+
+        # Combine all batch results into a single DataFrame
+        df_monthly = pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(months, name='time'),
+            columns=pd.Index(comids, name='rivid'))
+
+        # Filter the DataFrame for the date range
+        df_filtered = df_monthly.loc[start_date:end_date]
+        return df_filtered
+    
+
+    def get_window(self, start_date: str = None, end_date: str = None) -> tuple:
+        """
+        Resolves the time window to download.
+
+        Args:
+            start_date (str): First month to download (START_DATE if None).
+            end_date (str): Last month to download (the previous month if 
+                            None).
+
+        Returns:
+            tuple: The start date, the end month and the last day of the end 
+                   month, as 'YYYY-MM-DD' strings.
+        """
+        start_date = start_date or START_DATE
+        if end_date is None:
+            end_date = (datetime.now().replace(day=1) - pd.DateOffset(months=1)).strftime('%Y-%m-%d')
+        last_day = (pd.Timestamp(end_date) + pd.offsets.MonthEnd(0)).strftime('%Y-%m-%d')
+        return start_date, end_date, last_day
+
+
+    def read_bytes(self, ds: xr.Dataset, positions: np.ndarray, 
+                   time_range: tuple = None) -> int:
+        """
+        Computes the (uncompressed) bytes of the zarr chunks of Qout read to 
+        extract some rivid positions.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+            positions (np.ndarray): The rivid positions to extract.
+            time_range (tuple): The [start, stop) positions of the time window,
+                                the whole time axis if None.
+
+        Returns:
+            int: The number of bytes read.
+        """
+        chunks = self.get_chunks(ds)
+        start, stop = time_range or (0, ds.sizes['time'])
+        if stop <= start or len(positions) == 0:
+            return 0
+        time_chunks = (stop - 1) // chunks['time'] - start // chunks['time'] + 1
+        rivid_chunks = len(np.unique(np.asarray(positions) // chunks['rivid']))
+        chunk_bytes = int(np.prod(list(chunks.values()))) * ds['Qout'].dtype.itemsize
+        return int(time_chunks * rivid_chunks * chunk_bytes)
+    
+
+    def get_positions(self, ds: xr.Dataset, comids: list) -> np.ndarray:
+        """
+        Maps COMIDs to their integer positions along the rivid axis.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing river IDs.
+            comids (list): A list of COMIDs.
+
+        Returns:
+            np.ndarray: The position of each COMID in ds.rivid.
+
+        Raises:
+            ValueError: If any COMID is not in the dataset.
+        """
+        positions = ds.indexes['rivid'].get_indexer(np.atleast_1d(comids))
+        if (positions < 0).any():
+            missing = np.asarray(comids)[positions < 0]
+            raise ValueError(f"COMIDs not found in the dataset: {list(missing)}")
+        return positions
+
+
+    def get_chunks(self, ds: xr.Dataset) -> dict:
+        """
+        Retrieves the zarr chunk size of each dimension of Qout.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+
+        Returns:
+            dict: The chunk size of each dimension (e.g. {'time': 1000, 
+                  'rivid': 500}).
+        """
+        qout = ds['Qout']
+        chunks = qout.encoding.get('chunks') or qout.shape
+        return dict(zip(qout.dims, chunks))
+
+
+    def plan_batches(self, ds: xr.Dataset, positions: np.ndarray, 
+                     batch_size: int = 100, chunk_aligned: bool = False) -> list:
+        """
+        Splits the COMID positions into extraction batches.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+            positions (np.ndarray): The rivid positions of the COMIDs.
+            batch_size (int): Number of COMIDs in each batch (all of them at 
+                              once if None). Ignored if chunk_aligned.
+            chunk_aligned (bool): If True, makes one batch per zarr chunk, 
+                                  with the positions sorted inside it.
+
+        Returns:
+            list: One array per batch with the indices (into positions) of 
+                  the COMIDs extracted together.
+        """
+        if not chunk_aligned:
+            batch_size = batch_size or len(positions)
+            indices = np.arange(len(positions))
+            return [indices[i:i + batch_size] 
+                    for i in range(0, len(positions), batch_size)]
+
+        order = np.argsort(positions, kind='stable')
+        chunk_ids = positions[order] // self.get_chunks(ds)['rivid']
+        splits = np.flatnonzero(np.diff(chunk_ids)) + 1
+        return np.split(order, splits)
+
+
+    def dry_run(self, ds: xr.Dataset, csv: str, batch_size: int = 100, 
+                start_date: str = None, end_date: str = None) -> dict:
+        """
+        Reports how many zarr chunks and bytes are needed to download the 
+        COMIDs of a station list, with fixed and chunk-aligned batches.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+            csv (str): The path to the CSV file containing the list of COMIDs.
+            batch_size (int): Number of COMIDs in each fixed batch.
+            start_date (str): First month to download (START_DATE if None).
+            end_date (str): Last month to download (the previous month if 
+                            None).
+
+        Returns:
+            dict: The number of COMIDs, and the number of chunks and 
+                  (uncompressed) bytes read with each batching strategy.
+        """
+        comids = self.verify_comids(ds, csv)
+        positions = self.get_positions(ds, comids)
+        start_date, _, last_day = self.get_window(start_date, end_date)
+        time_range = ds.indexes['time'].slice_locs(start_date, last_day)
+        chunk_bytes = self.read_bytes(ds, positions[:1], (0, 1))
+
+        report = {'comids': len(comids)}
+        for name, aligned in [('fixed', False), ('chunk_aligned', True)]:
+            batches = self.plan_batches(ds, positions, batch_size, aligned)
+            n_bytes = sum(self.read_bytes(ds, positions[batch], time_range) 
+                          for batch in batches)
+            report[f'{name}_batches'] = len(batches)
+            report[f'{name}_chunks'] = n_bytes // chunk_bytes
+            report[f'{name}_bytes'] = n_bytes
+        return report
+
+
+    def _get_batch(self, qout: xr.DataArray, index: int, positions: np.ndarray) -> tuple:
+        """
+        Extracts one batch of COMIDs and resamples it to monthly means.
+
+        Args:
+            qout (xarray.DataArray): The (lazy) GEOGLOWS streamflow variable.
+            index (int): The position of the batch, used for reporting.
+            positions (np.ndarray): The rivid positions of the batch COMIDs.
+
+        Returns:
+            tuple: The monthly dates and a (time, rivid) array of monthly means.
+        """
+        start = time.perf_counter()
+        qout = qout.isel(rivid=positions).transpose('time', 'rivid')
+        values = qout.to_numpy()
+        months, monthly = self._monthly_mean(qout.time.to_numpy(), values)
+
+        self.batch_times[index] = time.perf_counter() - start
+        sliced, full = self.batch_bytes[index]
+        print(f"Downloaded batch {index + 1}/{len(self.batch_times)} "
+              f"({len(positions)} COMIDs) in {self.batch_times[index]:.2f} s, "
+              f"{sliced / 1e6:.1f} MB read ({full / 1e6:.1f} MB without time slicing)")
+        return months, monthly
+
+
+    def _monthly_mean(self, times: np.ndarray, values: np.ndarray) -> tuple:
+        """
+        Resamples a (time, rivid) array of sorted daily values to monthly 
+        means, ignoring NaN values as pandas resample('MS').mean() does.
+
+        Args:
+            times (np.ndarray): The datetime64 values of the time axis.
+            values (np.ndarray): A (time, rivid) array of streamflow values.
+
+        Returns:
+            tuple: The first day of each month and the (month, rivid) array 
+            of monthly means.
+        """
+        if len(times) == 0:
+            return times.astype('datetime64[ns]'), values.astype(values.dtype)
+
+        month_ids = times.astype('datetime64[M]')
+        months, starts = np.unique(month_ids, return_index=True)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(
+            np.where(valid, values, 0).astype(np.float64), starts, axis=0)
+        counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            monthly = (sums / counts).astype(values.dtype)
+        return months.astype('datetime64[ns]'), monthly
+
+
+    def get_last_dates(self, comids: list, dir_path: str) -> pd.Series:
+        """
+        Finds the last date stored for each COMID, in the columnar file if it
+        exists or else in the individual CSV files.
+
+        Args:
+            comids (list): A list of COMIDs.
+            dir_path (str): The directory path where the data were saved.
+
+        Returns:
+            pd.Series: The last date of each COMID, NaT if it has no data.
+        """
+        if os.path.exists(os.path.join(dir_path, COLUMNAR_FILE)):
+            data = self.read_data(dir_path, comids)
+            last_dates = data.apply(pd.Series.last_valid_index)
+            return last_dates.reindex(comids).astype('datetime64[ns]')
+
+        last_dates = {}
+        for comid in comids:
+            file_path = os.path.join(dir_path, f'{comid}.csv')
+            last_dates[comid] = pd.NaT
+            if not os.path.exists(file_path):
+                continue
+
+            # Read only the end of the file
+            with open(file_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 256))
+                lines = f.read().decode().strip().splitlines()
+            last_line = lines[-1].split(',')[0] if lines else ''
+            if last_line and last_line != 'time':
+                last_dates[comid] = pd.Timestamp(last_line)
+        return pd.Series(last_dates, dtype='datetime64[ns]')
+
+
+    def read_data(self, dir_path: str, comids: list = None) -> pd.DataFrame:
+        """
+        Reads the monthly streamflow matrix saved in dir_path, from the 
+        columnar file if it exists or else from the individual CSV files.
+
+        Args:
+            dir_path (str): The directory path where the data were saved.
+            comids (list): The COMIDs to read (all of them if None). COMIDs 
+                           without data are skipped.
+
+        Returns:
+            pd.DataFrame: A DataFrame where each column represents the streamflow
+            data for a specific COMID, indexed by time.
+        """
+        file_path = os.path.join(dir_path, COLUMNAR_FILE)
+        if os.path.exists(file_path):
+            parquet = pq.ParquetFile(file_path)
+            names = [name for name in parquet.schema_arrow.names if name != 'time']
+            if comids is not None:
+                requested = set(str(comid) for comid in comids)
+                names = [name for name in names if name in requested]
+            data = parquet.read(columns=names, use_pandas_metadata=True).to_pandas()
+            data.columns = pd.Index(data.columns.astype(np.int64), name='rivid')
+            return data
+
+        # Legacy layout: one CSV file per COMID
+        if comids is None:
+            comids = [file_name[:-4] for file_name in sorted(os.listdir(dir_path)) 
+                      if file_name.endswith('.csv') and file_name[:-4].isdigit()]
+        frames = []
+        for comid in comids:
+            file_path = os.path.join(dir_path, f'{comid}.csv')
+            if not os.path.exists(file_path):
+                continue
+            frame = pd.read_csv(file_path, sep=",", index_col=0, parse_dates=True)
+            frame.columns = [int(comid)]
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='time'))
+        data = pd.concat(frames, axis=1)
+        data.columns.name = 'rivid'
+        return data
+
+
+    def update_data(self, ds: xr.Dataset, comids: list, dir_path: str, 
+                    workers: int = 1) -> pd.DataFrame:
+        """
+        Downloads the last month stored for each COMID again, as it may have
+        been only partly simulated when it was downloaded, and the months 
+        after it, and adds them to the data saved in dir_path, overwriting 
+        that month. COMIDs without stored data are downloaded from the 
+        beginning.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset containing streamflow data
+            comids (list): A list of COMIDs to update.
+            dir_path (str): The directory path where the data were saved.
+            workers (int): Number of chunks downloaded concurrently.
+
+        Returns:
+            pd.DataFrame: The stored data with the new months, to be saved 
+            again.
+        """
+        last_dates = self.get_last_dates(comids=comids, dir_path=dir_path)
+        missing = list(last_dates.index[last_dates.isna()])
+        groups = [(None, missing)] if missing else []
+        for last_date, group in last_dates.dropna().groupby(last_dates.dropna()):
+            groups.append((last_date.strftime('%Y-%m-%d'), list(group.index)))
+
+        data = self.read_data(dir_path=dir_path)
+        for start_date, group_comids in groups:
+            new_data = self.get_data(ds=ds, comids=group_comids, workers=workers,
+                                     chunk_aligned=True, start_date=start_date)
+            if new_data.empty:
+                print(f"No new data since {start_date}")
+                continue
+            data = new_data.combine_first(data)
+        return data
+
+
+    def open_cube(self, dir_path: str) -> tuple:
+        """
+        Opens the memory-mapped historical cube saved with save_type="memmap".
+
+        Args:
+            dir_path (str): The directory path where the cube was saved.
+
+        Returns:
+            tuple: A read-only (time, comid) float32 np.memmap, the COMIDs of 
+                   its columns and the dates of its rows.
+        """
+        with open(os.path.join(dir_path, CUBE_INDEX)) as f:
+            index = json.load(f)
+        values = np.memmap(os.path.join(dir_path, CUBE_FILE), dtype=np.float32,
+                           mode='r', shape=tuple(index['shape']))
+        comids = np.asarray(index['comids'], dtype=np.int64)
+        dates = pd.DatetimeIndex(index['dates'], name='time')
+        return values, comids, dates
+
+
+    def save_data(self, data: pd.DataFrame, save_type: str, dir_path: str) -> None:
+        """
+        Saves the given DataFrame based on the specified save type.
+
+        Parameters:
+        - data (pd.DataFrame): The DataFrame containing the data to be saved.
+        - save_type (str): Specifies how to save the data. Options are:
+            - "overall": Saves the entire DataFrame to a single CSV file.
+            - "individual": Saves each column of the DataFrame as a separate CSV file.
+            - "columnar": Saves the whole DataFrame as a float32 (time x comid)
+              matrix in a single Parquet file.
+            - "memmap": Saves the whole DataFrame as a raw float32 (time x comid)
+              array, with a JSON index of COMIDs and dates, to be opened with 
+              open_cube.
+        - dir_path (str): The directory path where the files should be saved.
+
+        Raises:
+        - ValueError: If the save_type is not 'overall', 'individual', 
+          'columnar' or 'memmap'.
+        """
+        if save_type == "overall":
+            data.to_csv(os.path.join(dir_path, "historical_simulation.csv"))
+        elif save_type == "columnar":
+            temp_data = data.astype(np.float32)
+            temp_data.columns = temp_data.columns.astype(str)
+            temp_data.index.name = 'time'
+            temp_data.to_parquet(os.path.join(dir_path, COLUMNAR_FILE))
+        elif save_type == "memmap":
+            values = np.ascontiguousarray(data.to_numpy(dtype=np.float32))
+            values.tofile(os.path.join(dir_path, CUBE_FILE))
+            index = {
+                'shape': list(values.shape),
+                'comids': [int(comid) for comid in data.columns],
+                'dates': list(data.index.strftime('%Y-%m-%d')),
+            }
+            with open(os.path.join(dir_path, CUBE_INDEX), 'w') as f:
+                json.dump(index, f)
+        elif save_type == "individual":
+            for column in data.columns:
+                temp_data = data[[column]].copy()
+                temp_data.to_csv(os.path.join(dir_path, f'{column}.csv'))
+        else:
+            raise ValueError("save_type must be 'overall', 'individual', 'columnar' or 'memmap'!")
+        
+    def save_format_data(self, data: pd.DataFrame, save_type: str, dir_path: str) -> None:
+        """
+        Saves the given DataFrame based on the specified save type.
+
+        Parameters:
+        - data (pd.DataFrame): The DataFrame containing the data to be saved.
+        - save_type (str): Specifies how to save the data. Options are:
+            - "overall": Saves the entire DataFrame to a single CSV file.
+            - "individual": Saves each column of the DataFrame as a separate CSV file.
+        - dir_path (str): The directory path where the files should be saved.
+
+        Raises:
+        - ValueError: If the save_type is not 'overall' or 'individual'.
+        """
+        if save_type == "overall":
+            data.to_csv(os.path.join(dir_path, "historical_simulation.csv"))
+        elif save_type == "individual":
+            for column in data.columns:
+                temp_data = data[[column]].copy()
+                temp_data['year'] = temp_data.index.strftime('%Y')
+                temp_data['month'] = temp_data.index.strftime('%m')
+                temp_data = temp_data[['year', 'month', column]]
+                temp_data.to_csv(os.path.join(dir_path, f'{column}.csv'), sep='\t', header=False, index=False)
+        else:
+            raise ValueError("save_type must be 'overall' or 'individual'!")
+
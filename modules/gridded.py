@@ -0,0 +1,227 @@
+import os
+import glob
+import json
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# SDI scales (months) of the table columns, in the order of Nalbantis
+SCALES = [1, 3, 6, 9, 12]
+
+# Per-river SDI table, its blocks and its checkpoint, inside its directory
+GRIDDED_FILE = 'gridded_sdi.parquet'
+PARTS_DIR = 'gridded_sdi.parts'
+CHECKPOINT_FILE = 'gridded_sdi.json'
+
+class GriddedSDI:
+    """
+    A class for computing the latest SDI of every GEOGLOWS river inside a
+    bounding box, not only at the station COMIDs. Qout is streamed from the
+    zarr store one block of chunks at a time, so memory is bounded by the
+    block size, and each block is saved as soon as it is computed, so an
+    interrupted run resumes from the last checkpoint.
+    """
+
+    def __init__(self, dir_path: str, x_range: tuple, y_range: tuple) -> None:
+        """
+        Initializes the GriddedSDI object.
+
+        Args:
+            dir_path (str): The directory where the table is stored.
+            x_range (tuple): The minimum and maximum longitude of the box.
+            y_range (tuple): The minimum and maximum latitude of the box.
+        """
+        self.dir_path = dir_path
+        self.path = os.path.join(dir_path, GRIDDED_FILE)
+        self.parts_dir = os.path.join(dir_path, PARTS_DIR)
+        self.checkpoint_path = os.path.join(dir_path, CHECKPOINT_FILE)
+        self.x_range = x_range
+        self.y_range = y_range
+
+    def select_rivers(self, ds, rivers: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Finds the rivers of the dataset inside the bounding box.
+
+        Args:
+            ds (xarray.Dataset): The GEOGLOWS dataset.
+            rivers (pd.DataFrame): The coordinates of each river, with a
+                                   'rivid' (or 'LINKNO') and 'lon' and 'lat'
+                                   columns, e.g. the GEOGLOWS metadata
+                                   table. Not needed if the dataset has lon
+                                   and lat coordinates along rivid.
+
+        Returns:
+            pd.DataFrame: The 'rivid', 'lon' and 'lat' of each river inside
+            the box, in the order of the dataset.
+
+        Raises:
+            ValueError: If the coordinates of the rivers are not known.
+        """
+        if rivers is None:
+            if 'lon' not in ds or 'lat' not in ds:
+                raise ValueError("The dataset has no river coordinates, a rivers table is needed.")
+            rivers = pd.DataFrame({'rivid': ds.rivid.values,
+                                   'lon': ds['lon'].values, 'lat': ds['lat'].values})
+        rivers = rivers.rename(columns={'LINKNO': 'rivid'})[['rivid', 'lon', 'lat']]
+        inside = (rivers.lon.between(*self.x_range) & rivers.lat.between(*self.y_range)
+                  & rivers.rivid.isin(ds.rivid.values))
+        rivers = rivers[inside].astype({'rivid': np.int64})
+        order = np.argsort(ds.indexes['rivid'].get_indexer(rivers.rivid), kind='stable')
+        return rivers.iloc[order].reset_index(drop=True)
+
+    def plan_blocks(self, glw, ds, rivids: np.ndarray, block_size: int = 2000) -> list:
+        """
+        Groups the rivers in blocks of whole zarr chunks, so that each chunk
+        is read once.
+
+        Args:
+            glw (Geoglows): Finds the positions and chunks of the rivers.
+            ds (xarray.Dataset): The GEOGLOWS dataset.
+            rivids (np.ndarray): The rivers, in the order of the dataset.
+            block_size (int): Number of rivers from which a block is closed
+                              (a block holds at least one chunk).
+
+        Returns:
+            list: One array per block with the indices (into rivids) of its
+            rivers.
+        """
+        if len(rivids) == 0:
+            return []
+        batches = glw.plan_batches(ds, glw.get_positions(ds, rivids), chunk_aligned=True)
+        blocks, block = [], []
+        for batch in batches:
+            block.append(batch)
+            if sum(len(b) for b in block) >= block_size:
+                blocks.append(np.concatenate(block))
+                block = []
+        if block:
+            blocks.append(np.concatenate(block))
+        return blocks
+
+    def _read_checkpoint(self, key: dict) -> list:
+        """
+        Reads the blocks already computed, unless the checkpoint belongs to
+        another run (other rivers, block size or months).
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return []
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('key') != key:
+            return []
+        return [block for block in checkpoint['done']
+                if os.path.exists(self._part_path(block))]
+
+    def _write_checkpoint(self, key: dict, done: list) -> None:
+        """
+        Writes the blocks computed so far.
+        """
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': key, 'done': sorted(done)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _part_path(self, block: int) -> str:
+        """
+        Path of the table of one block.
+        """
+        return os.path.join(self.parts_dir, f"block_{block:05d}.parquet")
+
+    def run(self, glw, ds, nalbantis, rivers: pd.DataFrame, block_size: int = 2000,
+            workers: int = 1, start_date: str = None, end_date: str = None,
+            restart: bool = False) -> int:
+        """
+        Computes the latest SDI of every river, one block at a time, and
+        writes the per-river table. The blocks of a previous run with the
+        same rivers, block size and months are not computed again.
+
+        Args:
+            glw (Geoglows): Downloads the monthly streamflow of each block.
+            ds (xarray.Dataset): The GEOGLOWS dataset.
+            nalbantis (Nalbantis): Computes the SDI of each block.
+            rivers (pd.DataFrame): The 'rivid', 'lon' and 'lat' of each
+                                   river (e.g. from select_rivers).
+            block_size (int): Number of rivers downloaded and computed
+                              together, which bounds the memory used.
+            workers (int): Number of chunks downloaded concurrently.
+            start_date (str): First month of the record (START_DATE if None).
+            end_date (str): Last month of the record (the previous month if
+                            None).
+            restart (bool): If True, the checkpoint is ignored.
+
+        Returns:
+            int: The number of blocks computed (0 if all were done before).
+        """
+        rivids = rivers.rivid.to_numpy(dtype=np.int64)
+        blocks = self.plan_blocks(glw, ds, rivids, block_size)
+        start_date, end_date, _ = glw.get_window(start_date, end_date)
+        key = {'rivers': len(rivids), 'crc32': zlib.crc32(rivids.tobytes()),
+               'block_size': block_size, 'start_date': start_date, 'end_date': end_date}
+
+        os.makedirs(self.parts_dir, exist_ok=True)
+        done = [] if restart else self._read_checkpoint(key)
+        if not done:
+            for path in glob.glob(os.path.join(self.parts_dir, '*.parquet')):
+                os.remove(path)
+        self._write_checkpoint(key, done)
+
+        todo = [index for index in range(len(blocks)) if index not in done]
+        rivers_done = sum(len(blocks[index]) for index in done)
+        print(f"{len(rivids)} rivers in {len(blocks)} blocks, {len(done)} done before")
+        start = time.perf_counter()
+        for n, index in enumerate(todo):
+            block = blocks[index]
+            data = glw.get_data(ds=ds, comids=rivids[block].tolist(), workers=workers,
+                                chunk_aligned=True, start_date=start_date, end_date=end_date)
+            latest, _ = nalbantis.compute_latest_array(data.to_numpy(), data.index.month.to_numpy())
+            table = rivers.iloc[block].reset_index(drop=True)
+            for i, scale in enumerate(SCALES):
+                table[str(scale)] = latest[:, i].astype(np.float32)
+
+            # Saved before the checkpoint, so a listed block is always complete
+            tmp_path = f"{self._part_path(index)}.tmp"
+            table.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._part_path(index))
+            done.append(index)
+            self._write_checkpoint(key, done)
+
+            rivers_done += len(block)
+            elapsed = time.perf_counter() - start
+            remaining = elapsed / (n + 1) * (len(todo) - n - 1)
+            print(f"Block {index + 1}/{len(blocks)}: {rivers_done}/{len(rivids)} rivers, "
+                  f"{elapsed:.1f} s elapsed, {remaining:.1f} s remaining")
+
+        self._merge(len(blocks))
+        return len(todo)
+
+    def _merge(self, n_blocks: int) -> None:
+        """
+        Writes the tables of every block into the per-river table, one block
+        at a time.
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        writer = None
+        for index in range(n_blocks):
+            table = pq.read_table(self._part_path(index))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            columns = ['rivid', 'lon', 'lat'] + [str(scale) for scale in SCALES]
+            pd.DataFrame(columns=columns).to_parquet(tmp_path, index=False)
+        else:
+            writer.close()
+        os.replace(tmp_path, self.path)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Reads the per-river table.
+
+        Returns:
+            pd.DataFrame: The 'rivid', 'lon' and 'lat' of each river and its
+            latest SDI of each scale (columns '1', '3', ...), to be joined to
+            a stream network on its river ID (LINKNO).
+        """
+        return pd.read_parquet(self.path)
@@ -0,0 +1,410 @@
+import os
+import glob
+import time
+import hashlib
+import numpy as np
+import rasterio
+import rasterio.shutil
+import geopandas as gpd
+from scipy import sparse
+from scipy.spatial import cKDTree
+from rasterio.io import MemoryFile
+from rasterio.features import geometry_mask
+from rasterio.transform import from_origin
+
+# WGS84 equatorial radius (km) and flattening, as used by sp/gstat for
+# great circle distances on longlat data
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# Float32 no-data value written by the R raster package
+NODATA = -3.4e38
+
+# Cloud optimized GeoTIFF layout: the grids are a few hundred cells wide, so
+# small tiles are used to get at least one overview level
+COG_BLOCKSIZE = 32
+COG_COMPRESS = 'ZSTD'
+
+# Weight matrices kept in the cache directory, the least recently used are
+# removed first
+CACHE_SIZE = 8
+
+class IDW:
+    """
+    A class for interpolating station values onto a regular longitude/latitude
+    grid by Inverse Distance Weighting (IDW), as gstat::idw does in
+    generate_tif.R.
+    """
+
+    def __init__(self, x_range: tuple, y_range: tuple, resolution: float = 0.25,
+                 power: float = 2.0, neighbours: int = None,
+                 cache_dir: str = None, cache_size: int = CACHE_SIZE) -> None:
+        """
+        Initializes the IDW object with the grid definition.
+
+        Args:
+            x_range (tuple): The longitude of the first and last cell centers.
+            y_range (tuple): The latitude of the first and last cell centers.
+            resolution (float): The cell size in degrees.
+            power (float): The inverse distance power (2 is the gstat default).
+            neighbours (int): Number of nearest stations used for each cell
+                              (all of them if None, as gstat does by default;
+                              a few, e.g. 12, keep the weight matrix sparse
+                              but no longer match the R output).
+            cache_dir (str): Directory where the weight matrices are stored
+                             between runs (not cached if None).
+            cache_size (int): Number of weight matrices kept in the cache
+                              directory.
+        """
+        self.x_range = x_range
+        self.y_range = y_range
+        self.resolution = resolution
+        self.power = power
+        self.neighbours = neighbours
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+
+        # Cell centers, from west to east and from north to south
+        nx = int(round((x_range[1] - x_range[0]) / resolution)) + 1
+        ny = int(round((y_range[1] - y_range[0]) / resolution)) + 1
+        self.lon = x_range[0] + resolution * np.arange(nx)
+        self.lat = y_range[1] - resolution * np.arange(ny)
+        self.shape = (ny, nx)
+        self.transform = from_origin(
+            x_range[0] - resolution / 2, y_range[1] + resolution / 2,
+            resolution, resolution)
+
+    def _to_xyz(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """
+        Converts longitudes and latitudes to points on the unit sphere.
+        """
+        lon = np.radians(np.asarray(lon, dtype=np.float64))
+        lat = np.radians(np.asarray(lat, dtype=np.float64))
+        return np.column_stack([
+            np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+    def _gcdist(self, lon1: np.ndarray, lat1: np.ndarray,
+                lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+        """
+        Computes great circle distances (km) on the WGS84 ellipsoid with the
+        Andoyer-Lambert approximation of sp::spDists (gcdist.c).
+        """
+        lat1, lat2 = np.radians(lat1), np.radians(lat2)
+        f = (lat1 + lat2) / 2
+        g = (lat1 - lat2) / 2
+        l = (np.radians(lon1) - np.radians(lon2)) / 2
+        sin_g2, cos_g2 = np.sin(g) ** 2, np.cos(g) ** 2
+        sin_f2, cos_f2 = np.sin(f) ** 2, np.cos(f) ** 2
+        sin_l2, cos_l2 = np.sin(l) ** 2, np.cos(l) ** 2
+        s = sin_g2 * cos_l2 + cos_f2 * sin_l2
+        c = cos_g2 * cos_l2 + sin_f2 * sin_l2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.arctan(np.sqrt(s / c))
+            r = np.sqrt(s * c) / w
+            h1 = (3 * r - 1) / (2 * c)
+            h2 = (3 * r + 1) / (2 * s)
+            distance = 2 * w * WGS84_A * (
+                1 + WGS84_F * h1 * sin_f2 * cos_g2 - WGS84_F * h2 * cos_f2 * sin_g2)
+        return np.where(s == 0, 0.0, distance)
+
+    def compute_weights(self, lon: np.ndarray, lat: np.ndarray) -> sparse.csr_matrix:
+        """
+        Computes the (unnormalized) inverse distance weights between the grid
+        cells and the stations, using great circle distances. The nearest
+        stations are searched with a KD-tree on the unit sphere.
+
+        Args:
+            lon (np.ndarray): The longitude of each station.
+            lat (np.ndarray): The latitude of each station.
+
+        Returns:
+            sparse.csr_matrix: A (n_pixels, n_stations) matrix of weights. A
+            cell that coincides with a station only weights that station.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        grid_lon, grid_lat = np.meshgrid(self.lon, self.lat)
+        grid_lon, grid_lat = grid_lon.ravel(), grid_lat.ravel()
+        cells = self._to_xyz(grid_lon, grid_lat)
+        stations = self._to_xyz(lon, lat)
+        k = min(self.neighbours or len(stations), len(stations))
+
+        # Nearest stations of each cell, by chord length on the unit sphere
+        _, index = cKDTree(stations).query(cells, k=k)
+        index = index.reshape(len(cells), k)
+        distance = self._gcdist(grid_lon[:, None], grid_lat[:, None],
+                                lon[index], lat[index])
+
+        with np.errstate(divide='ignore'):
+            weights = distance ** -self.power
+        exact = distance == 0
+        hits = exact.any(axis=1)
+        weights[hits] = exact[hits].astype(np.float64)
+
+        rows = np.repeat(np.arange(len(cells)), k)
+        return sparse.csr_matrix(
+            (weights.ravel(), (rows, index.ravel())),
+            shape=(len(cells), len(stations)))
+
+    def _grid_definition(self) -> bytes:
+        """
+        Serializes the grid definition for the cache keys.
+        """
+        return repr((tuple(map(float, self.x_range)), tuple(map(float, self.y_range)),
+                     float(self.resolution))).encode()
+
+    def cache_key(self, lon: np.ndarray, lat: np.ndarray) -> str:
+        """
+        Hashes the station coordinates, the grid definition and the IDW
+        parameters that determine the weight matrix.
+        """
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(lon, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(lat, dtype=np.float64).tobytes())
+        digest.update(self._grid_definition())
+        digest.update(repr((float(self.power), self.neighbours)).encode())
+        return digest.hexdigest()
+
+    def get_weights(self, lon: np.ndarray, lat: np.ndarray) -> sparse.csr_matrix:
+        """
+        Returns the weight matrix of a station set, loading it from the cache
+        directory when it was already computed for the same stations, grid
+        and power, and computing and storing it otherwise (removing the
+        least recently used matrices beyond the cache size).
+
+        Args:
+            lon (np.ndarray): The longitude of each station.
+            lat (np.ndarray): The latitude of each station.
+
+        Returns:
+            sparse.csr_matrix: A (n_pixels, n_stations) matrix of weights.
+        """
+        if self.cache_dir is None:
+            return self.compute_weights(lon, lat)
+        path = os.path.join(self.cache_dir, f"idw_{self.cache_key(lon, lat)}.npz")
+        if os.path.exists(path):
+            self._touch(path)
+            return sparse.load_npz(path).tocsr()
+        weights = self.compute_weights(lon, lat)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            sparse.save_npz(f, weights)
+        os.replace(tmp_path, path)
+        self._touch(path)
+        self._evict()
+        return weights
+
+    def _touch(self, path: str) -> None:
+        """
+        Records the last use of a weight matrix in its modification time, in
+        nanoseconds (the file system clock may be much coarser).
+        """
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used weight matrices beyond the cache size.
+        """
+        paths = sorted(glob.glob(os.path.join(self.cache_dir, 'idw_*.npz')),
+                       key=os.path.getmtime, reverse=True)
+        for path in paths[self.cache_size:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Already removed by another process
+                pass
+
+    def interpolate(self, lon: np.ndarray, lat: np.ndarray,
+                    values: np.ndarray, weights: sparse.csr_matrix = None) -> np.ndarray:
+        """
+        Interpolates several variables at once over a shared weight matrix.
+
+        Args:
+            lon (np.ndarray): The longitude of each station.
+            lat (np.ndarray): The latitude of each station.
+            values (np.ndarray): A (station, variable) array, e.g. one column
+                                 per SDI scale. NaN values are left out and
+                                 the weights of the other stations are
+                                 renormalized.
+            weights (sparse.csr_matrix): Precomputed weights (taken from
+                                         get_weights if None).
+
+        Returns:
+            np.ndarray: A (variable, row, column) array with the interpolated
+            grids, from north to south.
+        """
+        if weights is None:
+            weights = self.get_weights(lon, lat)
+        values = np.asarray(values, dtype=np.float64).reshape(len(lon), -1)
+        valid = np.isfinite(values)
+        total = weights @ np.where(valid, values, 0)
+        norm = weights @ valid.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grids = total / norm
+        return grids.T.reshape((values.shape[1],) + self.shape)
+
+    def compute_mask(self, gdf: gpd.GeoDataFrame) -> tuple:
+        """
+        Rasterizes the geometries on the grid once: the crop window snaps to
+        the nearest cell edges, as raster::crop does, and the cells whose
+        center is outside the geometries are flagged, as raster::mask does.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The geometries used for masking.
+
+        Returns:
+            tuple: The crop window (row0, row1, col0, col1) and a boolean
+            array over the window, True outside the geometries.
+        """
+        xmin, ymin, xmax, ymax = gdf.total_bounds
+        x0 = self.transform.c
+        y0 = self.transform.f
+        col0 = int(np.clip(round((xmin - x0) / self.resolution), 0, self.shape[1]))
+        col1 = int(np.clip(round((xmax - x0) / self.resolution), 0, self.shape[1]))
+        row0 = int(np.clip(round((y0 - ymax) / self.resolution), 0, self.shape[0]))
+        row1 = int(np.clip(round((y0 - ymin) / self.resolution), 0, self.shape[0]))
+        window = (row0, row1, col0, col1)
+        outside = geometry_mask(gdf.geometry, out_shape=(row1 - row0, col1 - col0),
+                                transform=self.window_transform(window))
+        return window, outside
+
+    def get_mask(self, boundary) -> tuple:
+        """
+        Returns the crop window and mask of a country boundary, loading them
+        from the cache directory when they were already computed for the
+        same shapefile and grid, and computing and storing them otherwise.
+        The original geometry is used: the cell center test is exact, so
+        any simplification could move cells in or out of the mask.
+
+        Args:
+            boundary (Boundary): The country boundary.
+
+        Returns:
+            tuple: The crop window (row0, row1, col0, col1) and a boolean
+            array over the window, True outside the geometries.
+        """
+        if self.cache_dir is None:
+            return self.compute_mask(boundary.get(0.0))
+        digest = hashlib.sha1(boundary.key.encode())
+        digest.update(self._grid_definition())
+        path = os.path.join(self.cache_dir, f"mask_{digest.hexdigest()}.npz")
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return tuple(int(i) for i in cached['window']), cached['outside']
+        window, outside = self.compute_mask(boundary.get(0.0))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, window=np.array(window), outside=outside)
+        os.replace(tmp_path, path)
+        return window, outside
+
+    def window_transform(self, window: tuple):
+        """
+        Returns the affine transform of a crop window (row0, row1, col0, col1).
+        """
+        return from_origin(self.transform.c + window[2] * self.resolution,
+                           self.transform.f - window[0] * self.resolution,
+                           self.resolution, self.resolution)
+
+    def mask(self, grids: np.ndarray, boundary) -> tuple:
+        """
+        Crops the grids to the extent of a country boundary and sets the
+        cells outside its geometries to NaN, using the cached mask.
+
+        Args:
+            grids (np.ndarray): A (variable, row, column) array of grids.
+            boundary (Boundary): The country boundary used for masking.
+
+        Returns:
+            tuple: The cropped and masked grids and their affine transform.
+        """
+        window, outside = self.get_mask(boundary)
+        row0, row1, col0, col1 = window
+        cropped = grids[:, row0:row1, col0:col1].copy()
+        cropped[:, outside] = np.nan
+        return cropped, self.window_transform(window)
+
+    def save_tif(self, grid: np.ndarray, transform, path: str,
+                 descriptions: list = None, cog: bool = False) -> None:
+        """
+        Saves one grid, or several as the bands of a single file, as a tiled
+        float32 GeoTIFF with a TFW world file.
+
+        Args:
+            grid (np.ndarray): A (row, column) grid or a (band, row, column)
+                               array of grids, NaN for no data.
+            transform (affine.Affine): The affine transform of the grid.
+            path (str): The output GeoTIFF path.
+            descriptions (list): Optional description of each band.
+            cog (bool): Whether to write a cloud optimized GeoTIFF, with
+                        ZSTD compression, a floating point predictor and
+                        averaged overviews.
+        """
+        bands = grid.reshape((-1,) + grid.shape[-2:])
+        profile = {
+            'driver': 'GTiff', 'dtype': 'float32', 'nodata': NODATA,
+            'width': bands.shape[2], 'height': bands.shape[1], 'count': len(bands),
+            'crs': 'EPSG:4326', 'transform': transform,
+        }
+        data = np.where(np.isfinite(bands), bands, NODATA).astype(np.float32)
+        if not cog:
+            profile.update({
+                'compress': 'lzw', 'tiled': True, 'blockxsize': 256,
+                'blockysize': 256, 'interleave': 'band', 'tfw': 'YES',
+            })
+            with rasterio.open(path, 'w', **profile) as dst:
+                dst.write(data)
+                for band, description in enumerate(descriptions or [], start=1):
+                    dst.set_band_description(band, description)
+            return
+
+        # The COG driver only copies existing datasets, so the grids are
+        # written to memory first
+        with MemoryFile() as memfile:
+            with memfile.open(**profile) as dst:
+                dst.write(data)
+                for band, description in enumerate(descriptions or [], start=1):
+                    dst.set_band_description(band, description)
+            with memfile.open() as src:
+                rasterio.shutil.copy(
+                    src, path, driver='COG', compress=COG_COMPRESS, predictor=3,
+                    blocksize=COG_BLOCKSIZE, overviews='AUTO',
+                    overview_resampling='AVERAGE')
+
+        # World file, as written by the GTiff driver
+        world = [transform.a, transform.d, transform.b, transform.e,
+                 transform.c + transform.a / 2, transform.f + transform.e / 2]
+        with open(os.path.splitext(path)[0] + '.tfw', 'w') as f:
+            f.write('\n'.join(f'{value:.10f}' for value in world) + '\n')
+
+    def validate_cog(self, path: str) -> list:
+        """
+        Checks that a GeoTIFF is cloud optimized: tiled, compressed, with
+        overviews and with the COG layout (IFDs and overviews before the
+        full resolution tiles).
+
+        Args:
+            path (str): The GeoTIFF path.
+
+        Returns:
+            list: The problems found (empty if the file is a valid COG).
+        """
+        problems = []
+        with rasterio.open(path) as src:
+            structure = src.tags(ns='IMAGE_STRUCTURE')
+            if src.driver != 'GTiff':
+                problems.append(f"driver is {src.driver}, not GTiff")
+            if not src.profile.get('tiled', False):
+                problems.append("not tiled")
+            if src.compression is None:
+                problems.append("not compressed")
+            if structure.get('LAYOUT') != 'COG':
+                problems.append("no COG layout")
+            for band in src.indexes:
+                if min(src.width, src.height) > COG_BLOCKSIZE and not src.overviews(band):
+                    problems.append(f"band {band} has no overviews")
+        return problems
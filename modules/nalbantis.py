@@ -0,0 +1,498 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Numba is optional: without it the SDI is computed with NumPy
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Aggregation periods (months) of the Streamflow Drought Index
+SCALES = [1, 3, 6, 9, 12]
+
+# Values (time x station) from which the "auto" engine uses numba, as its
+# compilation (tens of seconds, on every run) only pays off on large cubes
+NUMBA_MIN_SIZE = 100_000_000
+
+class Nalbantis:
+    """
+    A class for computing and managing the Streamflow Drought Index (SDI) 
+    proposed by Nalbantis (2008).
+    """
+
+    def __init__(self, engine: str = "numpy", per_scale: bool = False) -> None:
+        """
+        Initializes the Nalbantis object.
+
+        Args:
+            engine (str): How the array methods (compute_array and 
+            compute_latest_array) are computed. Options are:
+                - "numpy": Vectorized NumPy, by blocks of stations.
+                - "numba": A compiled kernel that fuses the rolling means, 
+                  the monthly standardization and the NaN handling in one 
+                  parallel loop over the stations.
+                - "auto": "numba" if it is installed and the array has at 
+                  least NUMBA_MIN_SIZE values, else "numpy".
+            per_scale (bool): If True, the array methods validate each scale 
+            on its own, as compute_overall with dropna=False. By default a 
+            row is valid only where the 12-month mean is, as compute_overall 
+            does, so the published SDI values do not change.
+
+        Raises:
+            ValueError: If the engine is not 'auto', 'numpy' or 'numba'.
+            ImportError: If the engine is 'numba' and it is not installed.
+        """
+        if engine not in ["auto", "numpy", "numba"]:
+            raise ValueError("engine must be 'auto', 'numpy' or 'numba'!")
+        if engine == "numba" and njit is None:
+            raise ImportError("The 'numba' engine requires numba to be installed.")
+        self.engine = engine
+        self.per_scale = per_scale
+
+
+    def _use_numba(self, values: np.ndarray) -> bool:
+        """
+        Whether the array methods compute a streamflow array with numba.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly 
+            streamflow values.
+
+        Returns:
+            bool: True for the 'numba' engine, and for the 'auto' engine on 
+            arrays large enough when numba is installed.
+        """
+        if self.engine == "auto":
+            return njit is not None and np.size(values) >= NUMBA_MIN_SIZE
+        return self.engine == "numba"
+
+
+    def aggregate_data(self, streamflow: pd.DataFrame, dropna: bool = True) -> pd.DataFrame:
+        """
+        Aggregates streamflow data by calculating rolling means over different
+        periods (1, 3, 6, 9, and 12 months), all from a single cumulative sum.
+
+        Args:
+            streamflow (pd.DataFrame): A dataframe containing streamflow data 
+            with at least a 'value' column representing streamflow values.
+            dropna (bool): If True, only the rows with all the rolling means
+            are kept; otherwise every row is kept, with NaN in the periods 
+            whose window is incomplete.
+
+        Returns:
+            pd.DataFrame: The modified dataframe with additional columns for 
+            the rolling means.
+        """
+        means = self.rolling_means(streamflow[['value']].to_numpy(dtype=np.float64))
+        for i, months in enumerate(SCALES):
+            streamflow[f"value_{months}m"] = means[i, :, 0]
+        
+        return streamflow.dropna() if dropna else streamflow
+    
+    
+    def compute_sdi(self, streamflow: pd.DataFrame, column: str) -> pd.DataFrame:
+        """
+        Computes the Streamflow Drought Index (SDI) for a specific rolling 
+        mean column.
+
+        Args:
+            streamflow (pd.DataFrame): A dataframe with streamflow values.
+            column (str): The column name for which to compute SDI (e.g., 
+            'value', 'value_3m').
+
+        Returns:
+            pd.DataFrame: A dataframe with an additional SDI column for the 
+            specific rolling mean.
+        """
+        monthly_stats = streamflow.groupby('month')[column].agg(
+            ['mean', 'std']).reset_index()
+        streamflow = streamflow.merge(monthly_stats, on='month', how='left')
+        streamflow[f"sdi_{column}"] = (
+            streamflow[column] - streamflow['mean']) / streamflow['std']
+        return streamflow.drop(['mean', 'std'], axis=1)
+    
+
+    def compute_sdi_indexed(self, streamflow: pd.DataFrame, 
+                            columns: list) -> np.ndarray:
+        """
+        Computes the Streamflow Drought Index (SDI) for several rolling mean
+        columns in a single pass, indexing a 12-row table of monthly 
+        statistics by the month number instead of merging it back.
+
+        Args:
+            streamflow (pd.DataFrame): A dataframe with streamflow values.
+            columns (list): The column names for which to compute SDI (e.g., 
+            ['value_1m', 'value_3m']).
+
+        Returns:
+            np.ndarray: A (row, column) array with the SDI values of each 
+            rolling mean column.
+        """
+        months = streamflow['month'].to_numpy(dtype=np.int64) - 1
+        grouped = streamflow.groupby('month')[columns]
+        mean = grouped.mean().reindex(range(1, 13)).to_numpy()
+        std = grouped.std().reindex(range(1, 13)).to_numpy()
+        return (streamflow[columns].to_numpy() - mean[months]) / std[months]
+    
+
+    def compute_overall(self, streamflow: pd.DataFrame, 
+                        method: str = "merge", dropna: bool = True) -> pd.DataFrame:
+        """
+        Compute the Streamflow Drought Index (SDI) for 1 month, 3 months, 6 
+        months, 9 months, and 12 months using the method proposed by Nalbantis 
+        (2008).
+
+        Args:
+            streamflow (pd.DataFrame): A dataframe with columns: year, month, 
+            day, value.
+            method (str): Specifies how to standardize the rolling means. 
+            Options are:
+                - "merge": Merges the monthly statistics of each period 
+                  with compute_sdi.
+                - "indexed": Standardizes all the periods in a single pass 
+                  with compute_sdi_indexed.
+            dropna (bool): If False, the first months are kept, with NaN in 
+            the periods whose window is incomplete (see aggregate_data).
+
+        Returns:
+            pd.DataFrame: A dataframe containing the SDI values for each period
+            (1m, 3m, 6m, 9m, 12m).
+
+        Raises:
+            ValueError: If the method is not 'merge' or 'indexed'.
+        """
+        if method not in ["merge", "indexed"]:
+            raise ValueError("method must be 'merge' or 'indexed'!")
+
+        streamflow = self.aggregate_data(streamflow, dropna=dropna)
+        columns = [f"value_{months}m" for months in SCALES]
+
+        if method == "indexed":
+            # Overwrite the rolling means with their SDI values in place
+            streamflow[columns] = self.compute_sdi_indexed(streamflow, columns)
+            streamflow.rename(columns={
+                column: f"sdi_{column}" for column in columns}, inplace=True)
+            streamflow.reset_index(drop=True, inplace=True)
+            return streamflow
+
+        # Compute SDI for each period (1m, 3m, 6m, 9m, 12m)
+        for months in [1, 3, 6, 9, 12]:
+            streamflow = self.compute_sdi(streamflow, f'value_{months}m') 
+        streamflow = streamflow.drop(
+            ["value_1m","value_3m","value_6m","value_9m","value_12m"], axis=1)
+        return streamflow
+
+
+    def rolling_means(self, values: np.ndarray) -> np.ndarray:
+        """
+        Computes the trailing rolling means (1, 3, 6, 9 and 12 months) of a
+        2-D streamflow matrix, as differences of one cumulative sum.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly
+            streamflow values (e.g. a float32 np.memmap).
+
+        Returns:
+            np.ndarray: A (scale, time, station) array with the rolling mean 
+            of each scale. The first months of each scale, and any window 
+            containing a NaN value, are set to NaN, each scale on its own.
+        """
+        values = np.asarray(values)
+        n_times = values.shape[0]
+        finite = np.isfinite(values)
+        gaps = not finite.all()
+
+        # Cumulative sums of the values and of the missing values, with a
+        # leading row of zeros so that a window is the difference of two rows
+        totals = np.zeros((n_times + 1,) + values.shape[1:])
+        np.cumsum(np.where(finite, values, 0) if gaps else values, axis=0, out=totals[1:])
+        if gaps:
+            missing = np.zeros((n_times + 1,) + values.shape[1:], dtype=np.int32)
+            np.cumsum(~finite, axis=0, out=missing[1:])
+
+        means = np.full((len(SCALES),) + values.shape, np.nan)
+        for i, months in enumerate(SCALES):
+            if months > n_times:
+                continue
+            window_mean = means[i, months - 1:]
+            np.subtract(totals[months:], totals[:-months], out=window_mean)
+            window_mean /= months
+            if gaps:
+                window_mean[missing[months:] != missing[:-months]] = np.nan
+        return means
+
+
+    def standardize(self, aggregated: np.ndarray, months: np.ndarray, 
+                    valid: np.ndarray) -> np.ndarray:
+        """
+        Standardizes an aggregated streamflow matrix using the mean and 
+        standard deviation of each calendar month.
+
+        Args:
+            aggregated (np.ndarray): A (time, station) array with the rolling 
+            mean of one scale.
+            months (np.ndarray): A (time,) array with the calendar month 
+            (1-12) of each row.
+            valid (np.ndarray): A (time, station) boolean array with the rows 
+            used to compute the monthly statistics.
+
+        Returns:
+            np.ndarray: A (time, station) array with the SDI values. Invalid 
+            rows are set to NaN.
+        """
+        mean = np.full((12, aggregated.shape[1]), np.nan)
+        std = np.full((12, aggregated.shape[1]), np.nan)
+        for month in range(1, 13):
+            rows = months == month
+            data = aggregated[rows]
+            mask = valid[rows]
+            count = mask.sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean[month - 1] = np.where(mask, data, 0).sum(axis=0) / count
+                sq_dev = np.where(mask, data - mean[month - 1], 0) ** 2
+                std[month - 1] = np.sqrt(sq_dev.sum(axis=0) / (count - 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sdi = (aggregated - mean[months - 1]) / std[months - 1]
+        sdi[~valid] = np.nan
+        return sdi
+
+
+    def compute_array(self, values: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """
+        Computes the SDI for 1, 3, 6, 9 and 12 months for every station of a 
+        (time, station) streamflow matrix at once.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly 
+            streamflow values.
+            months (np.ndarray): A (time,) array with the calendar month 
+            (1-12) of each row.
+
+        Returns:
+            np.ndarray: A (scale, time, station) array with the SDI values. 
+            As in compute_overall, a row is only valid when all the rolling 
+            means are available (each scale on its own if per_scale, as in 
+            compute_overall with dropna=False).
+        """
+        return self._compute_valid(values, months)[0]
+
+
+    def _compute_valid(self, values: np.ndarray, months: np.ndarray) -> tuple:
+        """
+        Computes the SDI array together with the (scale, time, station) mask 
+        of its valid rows.
+        """
+        months = np.asarray(months, dtype=np.int64)
+        if self._use_numba(values):
+            return _sdi_kernel(np.asarray(values), months, np.asarray(SCALES), False,
+                               self.per_scale)
+        means = self.rolling_means(values)
+        if self.per_scale:
+            valid = np.isfinite(means)
+        else:
+            valid = np.broadcast_to(np.isfinite(means[-1]), means.shape)
+        for i in range(len(SCALES)):
+            means[i] = self.standardize(means[i], months, valid[i])
+        return means, valid
+
+
+    def compute_latest(self, streamflow: pd.DataFrame) -> pd.DataFrame:
+        """
+        Computes the most recent SDI values for all the stations of a wide 
+        monthly streamflow DataFrame, as produced by Geoglows.get_data.
+
+        Args:
+            streamflow (pd.DataFrame): A DataFrame indexed by time with one 
+            column of monthly streamflow per COMID.
+
+        Returns:
+            pd.DataFrame: A station-by-scale DataFrame indexed by COMID with 
+            the columns '1', '3', '6', '9' and '12'. Stations without any 
+            valid row are dropped.
+        """
+        months = pd.DatetimeIndex(streamflow.index).month.to_numpy()
+        latest, has_data = self.compute_latest_array(
+            streamflow.to_numpy(dtype=np.float64), months)
+        return pd.DataFrame(
+            latest[has_data],
+            index=streamflow.columns[has_data],
+            columns=[str(months) for months in SCALES])
+
+
+    def compute_latest_array(self, values: np.ndarray, months: np.ndarray, 
+                             block_size: int = 2000) -> tuple:
+        """
+        Computes the most recent SDI values for all the stations of a 
+        (time, station) streamflow array, without building pandas objects.
+
+        Args:
+            values (np.ndarray): A (time, station) array of monthly 
+            streamflow values (e.g. a float32 np.memmap, which is read block 
+            by block without copying it whole).
+            months (np.ndarray): A (time,) array with the calendar month 
+            (1-12) of each row.
+            block_size (int): Number of stations processed together, which 
+            bounds the memory used by the intermediate arrays (not used by 
+            the numba engine, which keeps one station per thread).
+
+        Returns:
+            tuple: A (station, scale) array with the SDI values of the last 
+            valid row of each station (with per_scale, the last row with any 
+            valid scale, NaN in the scales whose window is incomplete), and a 
+            (station,) boolean array that is False for the stations without 
+            any valid row.
+        """
+        if self._use_numba(values):
+            # Only the last valid row is kept, so no block is needed
+            months = np.asarray(months, dtype=np.int64)
+            sdi, valid = _sdi_kernel(np.asarray(values), months, np.asarray(SCALES), True,
+                                     self.per_scale)
+            return sdi[:, 0].T, valid[:, 0].any(axis=0)
+
+        n_times, n_stations = values.shape
+        latest = np.full((n_stations, len(SCALES)), np.nan)
+        has_data = np.zeros(n_stations, dtype=bool)
+
+        for start in range(0, n_stations, block_size):
+            block = slice(start, start + block_size)
+            sdi, valid = self._compute_valid(values[:, block], months)
+            valid = valid.any(axis=0)
+
+            # Take the last valid row of each station
+            last = n_times - 1 - np.argmax(valid[::-1], axis=0)
+            stations = np.arange(valid.shape[1])
+            latest[block] = sdi[:, last, stations].T
+            has_data[block] = valid.any(axis=0)
+
+        latest[~has_data] = np.nan
+        return latest, has_data
+
+
+
+def _sdi_kernel(values, months, scales, latest_only, per_scale):
+    """
+    Computes the SDI of every scale for each station of a (time, station)
+    array in one pass: the rolling means are running sums (windows with a
+    non-finite value are NaN), and each mean is standardized with the mean
+    and standard deviation (ddof=1) of the valid rows of its scale and
+    calendar month. A row is valid where the longest mean is finite, or
+    each scale where its own mean is if per_scale. Only the last row with
+    any valid scale of each station is returned if latest_only.
+    """
+    n_times, n_stations = values.shape
+    n_scales = len(scales)
+    n_rows = 1 if latest_only else n_times
+    sdi = np.full((n_scales, n_rows, n_stations), np.nan)
+    valid = np.zeros((n_scales, n_rows, n_stations), dtype=np.bool_)
+
+    for station in prange(n_stations):
+        # The column is read once, as the array is stored by rows
+        column = np.empty(n_times)
+        for t in range(n_times):
+            column[t] = values[t, station]
+
+        # Rolling means of every scale
+        means = np.full((n_scales, n_times), np.nan)
+        for i in range(n_scales):
+            window = scales[i]
+            total = 0.0
+            missing = 0
+            for t in range(n_times):
+                x = column[t]
+                if math.isfinite(x):
+                    total += x
+                else:
+                    missing += 1
+                if t >= window:
+                    x = column[t - window]
+                    if math.isfinite(x):
+                        total -= x
+                    else:
+                        missing -= 1
+                if t >= window - 1 and missing == 0:
+                    means[i, t] = total / window
+
+        # Without per_scale, the rows without the longest mean are dropped
+        if not per_scale:
+            for t in range(n_times):
+                if not math.isfinite(means[n_scales - 1, t]):
+                    for i in range(n_scales):
+                        means[i, t] = np.nan
+
+        # Mean and standard deviation of each scale and calendar month
+        count = np.zeros((n_scales, 12))
+        mean = np.zeros((n_scales, 12))
+        std = np.zeros((n_scales, 12))
+        last = -1
+        for t in range(n_times):
+            for i in range(n_scales):
+                if math.isfinite(means[i, t]):
+                    last = t
+                    count[i, months[t] - 1] += 1
+                    mean[i, months[t] - 1] += means[i, t]
+        for i in range(n_scales):
+            for month in range(12):
+                mean[i, month] = mean[i, month] / count[i, month] if count[i, month] > 0 else np.nan
+        for t in range(n_times):
+            for i in range(n_scales):
+                if math.isfinite(means[i, t]):
+                    std[i, months[t] - 1] += (means[i, t] - mean[i, months[t] - 1]) ** 2
+        for i in range(n_scales):
+            for month in range(12):
+                std[i, month] = (math.sqrt(std[i, month] / (count[i, month] - 1))
+                                 if count[i, month] > 1 else np.nan)
+
+        # Standardize the valid rows
+        first = last if latest_only else 0
+        for t in range(max(first, 0), n_times if last >= 0 else 0):
+            row = 0 if latest_only else t
+            for i in range(n_scales):
+                if math.isfinite(means[i, t]):
+                    valid[i, row, station] = True
+                    sdi[i, row, station] = ((means[i, t] - mean[i, months[t] - 1])
+                                            / std[i, months[t] - 1])
+    return sdi, valid
+
+
+if njit is not None:
+    _sdi_kernel = njit(parallel=True, error_model='numpy')(_sdi_kernel)
+
+
+class RollingMeans:
+    """
+    A class for the trailing rolling means (1, 3, 6, 9 and 12 months) of a
+    streamflow record that grows month by month: the last months are kept
+    between updates, so each update only reads the new rows.
+    """
+
+    def __init__(self, n_stations: int, tail: np.ndarray = None) -> None:
+        """
+        Initializes the RollingMeans object.
+
+        Args:
+            n_stations (int): Number of stations (columns) of the record.
+            tail (np.ndarray): The (11, station) last months of a previous 
+            record, e.g. saved from the tail attribute (no months if None).
+        """
+        self.nalbantis = Nalbantis()
+        self.tail = (np.full((max(SCALES) - 1, n_stations), np.nan) 
+                     if tail is None else np.asarray(tail, dtype=np.float64))
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        """
+        Adds new months to the record.
+
+        Args:
+            values (np.ndarray): A (time, station) array with the months that
+            follow the last update (a (station,) array for a single month).
+
+        Returns:
+            np.ndarray: A (scale, time, station) array with the rolling means 
+            of the new months, as rolling_means would give for them on the 
+            whole record.
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        window = np.concatenate([self.tail, values])
+        self.tail = window[len(window) - len(self.tail):]
+        return self.nalbantis.rolling_means(window)[:, len(window) - len(values):]
@@ -0,0 +1,98 @@
+import numpy as np
+from matplotlib.colors import BoundaryNorm, ListedColormap, to_rgba_array
+
+# SDI classes: bin edges and colours. Each bin includes its lower edge and
+# the last one also includes its upper edge; values outside are not drawn.
+SDI_BOUNDS = [
+    -10.0, -2.75, -2.5, -2.25, -2.0, -1.75, -1.5, -1.25, -1.0, -0.75, -0.25,
+    0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 10.0,
+]
+SDI_COLORS = [
+    '#890002', '#a10001', '#ca0000', '#e50201', '#f41f0a', '#f1651d',
+    '#ed9028', '#e9aa2d', '#dfbf77', '#c8c8c8', '#c8c8c8', '#54ba57',
+    '#009e3c', '#00a1df', '#00b0df', '#00b8e0', '#009fdf', '#007cdf',
+    '#0062df', '#7100d0', '#8900b0', '#a00090',
+]
+
+class Palette:
+    """
+    A class for mapping SDI values to colours from a single table of bin
+    edges and colours, shared by the PNG maps and any other output.
+    """
+
+    def __init__(self, bounds: list = SDI_BOUNDS, colors: list = SDI_COLORS) -> None:
+        """
+        Initializes the Palette object with the colour table.
+
+        Args:
+            bounds (list): The increasing bin edges (one more than colors).
+            colors (list): The colour of each bin, as hex strings.
+        """
+        if len(bounds) != len(colors) + 1:
+            raise ValueError("bounds must have one more element than colors.")
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.colors = list(colors)
+
+        # RGBA lookup table, with a transparent row for values out of range
+        self.lut = np.zeros((len(colors) + 1, 4), dtype=np.uint8)
+        self.lut[:-1] = np.round(to_rgba_array(colors) * 255).astype(np.uint8)
+
+    def classify(self, values: np.ndarray) -> np.ndarray:
+        """
+        Finds the bin of each value.
+
+        Args:
+            values (np.ndarray): The values to classify (any shape).
+
+        Returns:
+            np.ndarray: The bin index of each value, or len(colors) for NaN
+            and values outside the bins.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        index = np.digitize(values, self.bounds) - 1
+        index[values == self.bounds[-1]] = len(self.colors) - 1
+        index[(index < 0) | (index >= len(self.colors)) | np.isnan(values)] = len(self.colors)
+        return index
+
+    def to_rgba(self, values: np.ndarray) -> np.ndarray:
+        """
+        Colours a whole array in one call.
+
+        Args:
+            values (np.ndarray): The values to colour (any shape).
+
+        Returns:
+            np.ndarray: A uint8 array with an extra last axis of size 4
+            (RGBA), transparent for NaN and values outside the bins.
+        """
+        return self.lut[self.classify(values)]
+
+    def color(self, value: float) -> str:
+        """
+        Returns the hex colour of a single value, or 'none' if it is NaN or
+        outside the bins.
+        """
+        index = int(self.classify(np.array([value]))[0])
+        return self.colors[index] if index < len(self.colors) else "none"
+
+    def get_cmap(self, vmin: float = -3.0, vmax: float = 3.0) -> tuple:
+        """
+        Builds the matplotlib colormap and norm for the range shown in a
+        colorbar. Values beyond the range take the colour of the outer bins.
+
+        Args:
+            vmin (float): The lower limit of the colorbar.
+            vmax (float): The upper limit of the colorbar.
+
+        Returns:
+            tuple: A ListedColormap and its BoundaryNorm.
+        """
+        inner = self.bounds[(self.bounds > vmin) & (self.bounds < vmax)]
+        bounds = np.concatenate([[vmin], inner, [vmax]])
+        first = max(int(np.searchsorted(self.bounds, vmin, side='right')) - 1, 0)
+        colors = self.colors[first:first + len(bounds) - 1]
+        cmap = ListedColormap(colors)
+        cmap.set_under(colors[0])
+        cmap.set_over(colors[-1])
+        cmap.set_bad((0, 0, 0, 0))
+        return cmap, BoundaryNorm(bounds, cmap.N)
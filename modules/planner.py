@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+class DownloadPlan:
+    """
+    A class for planning a single download of the COMIDs requested by
+    several station lists, so that a river listed more than once (a border
+    river in the lists of two countries, or a station in two lists of the
+    same country) is fetched only once.
+    """
+
+    def __init__(self, requests: dict, available: list = None) -> None:
+        """
+        Initializes the DownloadPlan object.
+
+        Args:
+            requests (dict): The COMIDs requested by each station list, by
+                             name (repeated COMIDs are allowed).
+            available (list): The COMIDs in the dataset; the others are
+                              left out of the plan (all kept if None).
+        """
+        self.requests = {}
+        self.missing = {}
+        for name, comids in requests.items():
+            comids = pd.Series(comids, dtype='float64').dropna().astype(np.int64).to_numpy()
+            if available is not None:
+                found = np.isin(comids, np.asarray(available, dtype=np.int64))
+                self.missing[name] = sorted(set(comids[~found].tolist()))
+                comids = comids[found]
+            self.requests[name] = comids
+        self.union = sorted(set().union(*[set(comids.tolist()) for comids in self.requests.values()]))
+
+    @classmethod
+    def from_csv(cls, csvs: dict, available: list = None) -> "DownloadPlan":
+        """
+        Builds the plan from the 'comid' column of station list CSV files.
+
+        Args:
+            csvs (dict): The CSV path (or list of paths) of each name.
+            available (list): The COMIDs in the dataset.
+
+        Returns:
+            DownloadPlan: The download plan.
+        """
+        requests = {}
+        for name, paths in csvs.items():
+            paths = [paths] if isinstance(paths, str) else paths
+            requests[name] = pd.concat([pd.read_csv(path)['comid'] for path in paths]).tolist()
+        return cls(requests, available)
+
+    def subset(self, name: str) -> list:
+        """
+        Returns the distinct COMIDs of one station list, sorted.
+        """
+        return sorted(set(self.requests[name].tolist()))
+
+    def shared(self) -> dict:
+        """
+        Finds the COMIDs requested by more than one station list.
+
+        Returns:
+            dict: The names of the lists requesting each shared COMID.
+        """
+        owners = {}
+        for name, comids in self.requests.items():
+            for comid in set(comids.tolist()):
+                owners.setdefault(comid, []).append(name)
+        return {comid: names for comid, names in sorted(owners.items()) if len(names) > 1}
+
+    def report(self, glw=None, ds=None) -> dict:
+        """
+        Counts the fetches saved by downloading the union of the COMIDs
+        instead of every list on its own, and optionally the chunk-aligned
+        batches (one per zarr chunk of rivers) read.
+
+        Args:
+            glw (Geoglows): Used with ds to count the batches read.
+            ds (xarray.Dataset): The GEOGLOWS dataset.
+
+        Returns:
+            dict: The number of COMIDs requested, listed twice in the same
+                  list, shared between lists, missing from the dataset and
+                  fetched, and of fetches saved (plus the batches read
+                  per list and for the union, if glw and ds are given).
+        """
+        requested = sum(len(comids) for comids in self.requests.values())
+        distinct = sum(len(set(comids.tolist())) for comids in self.requests.values())
+        report = {
+            'requested': requested,
+            'repeated_in_list': requested - distinct,
+            'shared_between_lists': len(self.shared()),
+            'missing': sum(len(comids) for comids in self.missing.values()),
+            'fetched': len(self.union),
+            'fetches_saved': requested - len(self.union),
+        }
+        if glw is not None and ds is not None:
+            report['chunk_batches_per_list'] = sum(
+                self._count_batches(glw, ds, self.subset(name)) for name in self.requests)
+            report['chunk_batches_union'] = self._count_batches(glw, ds, self.union)
+        return report
+
+    def _count_batches(self, glw, ds, comids: list) -> int:
+        """
+        Counts the chunk-aligned batches needed to download some COMIDs.
+        """
+        if not comids:
+            return 0
+        return len(glw.plan_batches(ds, glw.get_positions(ds, comids), chunk_aligned=True))
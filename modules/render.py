@@ -0,0 +1,294 @@
+import os
+import time
+import numpy as np
+import matplotlib
+import geopandas as gpd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, ImageDraw, ImageFont
+from rasterio.features import rasterize
+from affine import Affine
+from concurrent.futures import ProcessPoolExecutor
+
+# Font shipped with matplotlib, with the accented characters of the titles
+FONT_PATH = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf', 'DejaVuSans.ttf')
+
+class Renderer:
+    """
+    A class for writing the SDI maps as PNG images straight from the masked
+    grids, without matplotlib figures: the grid is coloured through the
+    palette lookup table, the country boundary is rasterized once and
+    burned in, and the legend is drawn once and pasted on every image.
+    """
+
+    def __init__(self, palette, gdf: gpd.GeoDataFrame, transform: Affine,
+                 shape: tuple, map_height: int = 480, margin: int = 1,
+                 vmin: float = -3.0, vmax: float = 3.0, tick: float = 0.5) -> None:
+        """
+        Initializes the Renderer object for one grid window.
+
+        Args:
+            palette (Palette): Colour table of the SDI classes.
+            gdf (gpd.GeoDataFrame): The geometries whose boundary is drawn.
+            transform (Affine): The affine transform of the grids.
+            shape (tuple): The (row, column) shape of the grids.
+            map_height (int): Approximate height of the map in pixels (each
+                              cell is drawn as a whole number of pixels).
+            margin (int): Blank cells drawn around the grid window.
+            vmin (float): The lower limit of the legend.
+            vmax (float): The upper limit of the legend.
+            tick (float): Spacing of the legend labels.
+        """
+        self.palette = palette
+        self.shape = shape
+        self.cell_size = max(map_height // (shape[0] + 2 * margin), 1)
+        self.margin = margin
+        self.font = ImageFont.truetype(FONT_PATH, 14)
+        self.small_font = ImageFont.truetype(FONT_PATH, 11)
+
+        # Boundary pixels of the map, at image resolution
+        height = (shape[0] + 2 * margin) * self.cell_size
+        width = (shape[1] + 2 * margin) * self.cell_size
+        origin = transform * (-margin, -margin)
+        map_transform = Affine(transform.a / self.cell_size, 0, origin[0],
+                               0, transform.e / self.cell_size, origin[1])
+        lines = [geom for geom in gdf.geometry.boundary if geom is not None and not geom.is_empty]
+        self.boundary = rasterize(lines, out_shape=(height, width), transform=map_transform,
+                                  all_touched=True, dtype=np.uint8).astype(bool)
+        self.legend = self._draw_legend(height, vmin, vmax, tick)
+
+    def _draw_legend(self, height: int, vmin: float, vmax: float, tick: float) -> Image.Image:
+        """
+        Draws the colourbar with its labels, extended at both ends.
+        """
+        cmap, norm = self.palette.get_cmap(vmin, vmax)
+        bar_width, bar_height, arrow = 18, height // 2, 12
+        legend = Image.new('RGBA', (bar_width + 50, height), (255, 255, 255, 255))
+        draw = ImageDraw.Draw(legend)
+        top = (height - bar_height) // 2
+        to_y = lambda value: top + round((vmax - value) / (vmax - vmin) * bar_height)
+
+        boundaries = norm.boundaries
+        for i in range(len(boundaries) - 1):
+            rgba = tuple(int(c * 255) for c in cmap(i))
+            draw.rectangle([0, to_y(boundaries[i + 1]), bar_width - 1, to_y(boundaries[i])], fill=rgba)
+        over = tuple(int(c * 255) for c in cmap.get_over())
+        under = tuple(int(c * 255) for c in cmap.get_under())
+        draw.polygon([(0, top), (bar_width - 1, top), (bar_width // 2, top - arrow)], fill=over)
+        draw.polygon([(0, top + bar_height), (bar_width - 1, top + bar_height),
+                      (bar_width // 2, top + bar_height + arrow)], fill=under)
+
+        for value in np.arange(vmin, vmax + tick / 2, tick):
+            y = to_y(value)
+            draw.line([bar_width, y, bar_width + 3, y], fill='black')
+            draw.text((bar_width + 6, y), f"{value:.1f}", fill='black',
+                      font=self.small_font, anchor='lm')
+        return legend
+
+    def render(self, grid: np.ndarray, title: str = "") -> Image.Image:
+        """
+        Renders a grid as an RGBA image with the boundary, legend and title.
+
+        Args:
+            grid (np.ndarray): A (row, column) grid, NaN for no data.
+            title (str): The title written above the map.
+
+        Returns:
+            Image.Image: The rendered image.
+        """
+        rgba = self.palette.to_rgba(grid)
+        rgba[rgba[..., 3] == 0] = 255
+        rgba = np.pad(rgba, ((self.margin, self.margin), (self.margin, self.margin), (0, 0)),
+                      constant_values=255)
+        rgba = rgba.repeat(self.cell_size, axis=0).repeat(self.cell_size, axis=1)
+        rgba[self.boundary] = (0, 0, 0, 255)
+
+        title_height = 24 * (title.count("\n") + 1) + 8 if title else 0
+        width = rgba.shape[1] + self.legend.width + 10
+        image = Image.new('RGBA', (width, rgba.shape[0] + title_height), (255, 255, 255, 255))
+        image.paste(Image.fromarray(rgba, mode='RGBA'), (0, title_height))
+        image.paste(self.legend, (rgba.shape[1] + 10, title_height))
+        if title:
+            ImageDraw.Draw(image).multiline_text(
+                (width // 2, 4), title, fill='black', font=self.font, anchor='ma', align='center')
+        return image
+
+    def save(self, grid: np.ndarray, path: str, title: str = "") -> None:
+        """
+        Renders a grid and writes it as a PNG file.
+
+        Args:
+            grid (np.ndarray): A (row, column) grid, NaN for no data.
+            path (str): The output PNG path.
+            title (str): The title written above the map.
+        """
+        self.render(grid, title).save(path, format='PNG')
+
+    def close(self) -> None:
+        """
+        Nothing to release (same interface as FigureTemplate).
+        """
+
+
+class FigureTemplate:
+    """
+    A class for the matplotlib ("publication") maps: the figure, boundary,
+    colormap and colourbar are built once and only the image data and the
+    title change between the SDI scales.
+    """
+
+    def __init__(self, palette, gdf: gpd.GeoDataFrame, transform: Affine,
+                 shape: tuple, xlim: tuple, ylim: tuple, vmin: float = -3.0,
+                 vmax: float = 3.0, tick: float = 0.5) -> None:
+        """
+        Initializes the FigureTemplate object for one grid window.
+
+        Args:
+            palette (Palette): Colour table of the SDI classes.
+            gdf (gpd.GeoDataFrame): The geometries whose boundary is drawn.
+            transform (Affine): The affine transform of the grids.
+            shape (tuple): The (row, column) shape of the grids.
+            xlim (tuple): The longitude limits of the map.
+            ylim (tuple): The latitude limits of the map.
+            vmin (float): The lower limit of the colourbar.
+            vmax (float): The upper limit of the colourbar.
+            tick (float): Spacing of the colourbar ticks.
+        """
+        self.palette = palette
+        cmap, norm = palette.get_cmap(vmin, vmax)
+        extent = (transform.c, transform.c + transform.a * shape[1],
+                  transform.f + transform.e * shape[0], transform.f)
+
+        # Figure outside pyplot, so it is not kept by the figure manager
+        self.fig = Figure(figsize=(8, 8))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.ax.margins(0)
+        self.image = self.ax.imshow(np.full(shape, np.nan), cmap=cmap, norm=norm, extent=extent)
+        gdf.plot(ax=self.ax, color='none', edgecolor='black', linewidth=1)
+        self.ax.set_xlim(*xlim)
+        self.ax.set_ylim(*ylim)
+        self.fig.colorbar(self.image, ax=self.ax, label='', pad=0.05, shrink=0.5,
+                          extend='both', spacing='proportional',
+                          ticks=np.arange(vmin, vmax + tick / 2, tick))
+        self.title = self.ax.set_title("")
+        self.ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    def save(self, grid: np.ndarray, path: str, title: str = "") -> None:
+        """
+        Swaps the image data and the title and writes the figure as PNG.
+
+        Args:
+            grid (np.ndarray): A (row, column) grid, NaN for no data.
+            path (str): The output PNG path.
+            title (str): The title written above the map.
+        """
+        grid = np.asarray(grid, dtype=np.float64)
+        outside = (grid < self.palette.bounds[0]) | (grid > self.palette.bounds[-1])
+        self.image.set_data(np.where(outside, np.nan, grid))
+        self.title.set_text(title)
+        self.fig.savefig(path, bbox_inches='tight', pad_inches=0)
+
+    def close(self) -> None:
+        """
+        Releases the figure and its artists.
+        """
+        self.fig.clear()
+        self.fig = self.ax = self.image = self.title = None
+
+
+# Renderer of the current worker process, built once by _init_worker
+_worker_renderer = None
+
+
+def _init_worker(renderer: type, args: tuple, kwargs: dict) -> None:
+    """
+    Builds the renderer of a worker process with the headless Agg backend.
+    """
+    global _worker_renderer
+    matplotlib.use('Agg')
+    _worker_renderer = renderer(*args, **kwargs)
+
+
+def _save(renderer, job: tuple) -> float:
+    """
+    Renders one (grid, path, title) job and returns the time it took.
+    """
+    grid, path, title = job
+    start = time.perf_counter()
+    renderer.save(grid, path, title=title)
+    return time.perf_counter() - start
+
+
+def _render(job: tuple) -> float:
+    """
+    Renders one job with the renderer of the worker process.
+    """
+    return _save(_worker_renderer, job)
+
+
+class MapPool:
+    """
+    A class for rendering several maps in parallel processes. Each worker
+    builds its own renderer (boundary, mask, colormap, legend) once and
+    then only receives the grids to draw. The workers are started on the
+    first render and kept until close, so one pool serves every month of
+    a run.
+    """
+
+    def __init__(self, renderer: type, args: tuple = (), kwargs: dict = None,
+                 workers: int = 1) -> None:
+        """
+        Initializes the MapPool object.
+
+        Args:
+            renderer (type): The renderer class (Renderer or FigureTemplate).
+            args (tuple): Positional arguments of the renderer.
+            kwargs (dict): Keyword arguments of the renderer.
+            workers (int): Number of processes (rendered in this process
+                           if 1).
+        """
+        self.renderer = renderer
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.workers = workers
+        self._executor = None
+        self._renderer = None
+
+    def render(self, jobs: list) -> list:
+        """
+        Renders the maps.
+
+        Args:
+            jobs (list): (grid, path, title) tuples.
+
+        Returns:
+            list: The time, in seconds, spent on each map.
+        """
+        if self.workers <= 1:
+            if self._renderer is None:
+                matplotlib.use('Agg')
+                self._renderer = self.renderer(*self.args, **self.kwargs)
+            return [_save(self._renderer, job) for job in jobs]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.renderer, self.args, self.kwargs))
+        return list(self._executor.map(_render, jobs))
+
+    def close(self) -> None:
+        """
+        Stops the worker processes and closes the renderer.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
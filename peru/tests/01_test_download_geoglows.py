@@ -4,9 +4,9 @@ import os
 def main():
     # Set up paths and call module
     root = os.path.dirname(__file__)
-    module_path = os.path.abspath(os.path.join(root, '..', 'modules'))
+    module_path = os.path.abspath(os.path.join(root, '..', '..'))
     sys.path.append(module_path)
-    from geoglows import Geoglows
+    from modules.geoglows import Geoglows
 
     # Instantiate the Geoglows class and retrieve the data bucket
     glw = Geoglows()
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Directory holding the national pipelines
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# National pipelines run by the orchestrator. Each one keeps its own
+# configuration (station list, shapefile, grid and map extent) in main.py
+COUNTRIES = ["bolivia", "chile", "colombia", "ecuador", "peru", "venezuela"]
+
+# The modules are shared by every national pipeline and imported once
+sys.path.insert(0, ROOT)
+from modules.geoglows import Geoglows
+from modules.planner import DownloadPlan
+
+# Historical store shared by every country, with each river stored once
+REGIONAL_DIR = os.path.dirname(os.path.abspath(__file__))
+DAT_DIR = os.path.join(REGIONAL_DIR, "data/historical")
+OUT_PATH_FORMATED = os.path.join(REGIONAL_DIR, "data/formated_historical")
+
+# Number of COMID batches downloaded concurrently
+DOWNLOAD_WORKERS = 4
+
+# Number of national pipelines run concurrently (one process each)
+COUNTRY_WORKERS = min(len(COUNTRIES), os.cpu_count() or 1)
+
+
+
+def country_path(country, path):
+    """Path of a file of a national pipeline, relative to its directory."""
+    return os.path.join(ROOT, country, path)
+
+
+def load_config(country):
+    """Import the main.py of a national pipeline as its configuration."""
+    spec = importlib.util.spec_from_file_location(
+        f"{country}_main", country_path(country, "main.py"))
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def plan_download(dataset, configs):
+    """Plan a single download of the station lists of every country."""
+    csvs = {country: country_path(country, config.COMIDS_PATH)
+            for country, config in configs.items()}
+    return DownloadPlan.from_csv(csvs, available=dataset.rivid.values)
+
+
+def report_plan(glw, dataset, plan):
+    """Print the COMIDs and fetches saved by downloading every river once."""
+    for key, value in plan.report(glw, dataset).items():
+        print(f"{key}: {value}")
+    for comid, countries in plan.shared().items():
+        print(f"{comid}: {', '.join(countries)}")
+
+
+def download_data(glw, dataset, plan, full=True, export_csv=False,
+                  workers=DOWNLOAD_WORKERS):
+    """Download the union of the COMIDs of every country in a single
+    chunk-aligned pass into the shared store (or, without full, only the
+    last month stored for each COMID, downloaded again, and the months after
+    it)."""
+    os.makedirs(DAT_DIR, exist_ok=True)
+    if full:
+        data = glw.get_data(ds=dataset, comids=plan.union, workers=workers, chunk_aligned=True)
+        save_historical(glw, data, export_csv)
+        return
+
+    data = glw.update_data(ds=dataset, comids=plan.union, dir_path=DAT_DIR, workers=workers)
+    save_historical(glw, data, export_csv)
+
+
+def save_historical(glw, data, export_csv=False):
+    """Save the shared historical data, optionally also as CSV files."""
+    glw.save_data(data=data, save_type="columnar", dir_path=DAT_DIR)
+    glw.save_data(data=data, save_type="memmap", dir_path=DAT_DIR)
+    if export_csv:
+        os.makedirs(OUT_PATH_FORMATED, exist_ok=True)
+        glw.save_data(data=data, save_type="individual", dir_path=DAT_DIR)
+        glw.save_format_data(data=data, save_type="individual", dir_path=OUT_PATH_FORMATED)
+
+
+def select_cube(cube, comids):
+    """Select the columns of some COMIDs from a memory-mapped cube."""
+    values, cube_comids, dates = cube
+    columns = np.flatnonzero(np.isin(cube_comids, comids))
+    return values[:, columns], cube_comids[columns], dates
+
+
+def run_country(country, glw, comids, args):
+    """Run the SDI, GeoTIFF and PNG stages of one country, in its own
+    directory, on its rivers of the shared store. Return the time it took."""
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    os.chdir(country_path(country, ""))
+    try:
+        config = load_config(country)
+        config.clear_output_directories(full=False)
+        cube = select_cube(glw.open_cube(dir_path=DAT_DIR), comids)
+        config.process(glw, args, cube=cube)
+    finally:
+        os.chdir(cwd)
+    return time.perf_counter() - start
+
+
+def run_countries(glw, plan, args):
+    """Run the national pipelines on the shared store, in parallel
+    processes."""
+    jobs = [(country, glw, plan.subset(country), args) for country in plan.requests]
+    if args.workers <= 1 or len(jobs) <= 1:
+        timings = [run_country(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            futures = [pool.submit(run_country, *job) for job in jobs]
+            timings = [future.result() for future in futures]
+    for (country, *_), elapsed in zip(jobs, timings):
+        print(f"{country}: {elapsed:.2f} s")
+
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Regional streamflow drought monitor")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report the COMIDs and fetches saved by the shared download")
+    parser.add_argument("--countries", nargs="+", choices=COUNTRIES, default=COUNTRIES,
+                        help="national pipelines to run")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild the historical data from scratch")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="also save the historical data as CSV/TSV files")
+    parser.add_argument("--multiband", action="store_true",
+                        help="save a single GeoTIFF with one band per SDI scale")
+    parser.add_argument("--publication", action="store_true",
+                        help="render the PNG maps with matplotlib figures")
+    parser.add_argument("--archive", action="store_true",
+                        help="also write the new and revised months to each country's SDI archive")
+    parser.add_argument("--engine", choices=["numpy", "numba", "auto"], default="numpy",
+                        help="how the SDI arrays are computed (numba compiles on every run)")
+    parser.add_argument("--climatology", action="store_true",
+                        help="update cached monthly statistics instead of recomputing them")
+    parser.add_argument("--reference", nargs=2, metavar=("START", "END"),
+                        help="freeze the climatology to a reference period (e.g. 1991-01 2020-12)")
+    parser.add_argument("--workers", type=int, default=COUNTRY_WORKERS,
+                        help="number of national pipelines run concurrently")
+    parser.add_argument("--plot-workers", type=int, default=1,
+                        help="number of PNG maps rendered concurrently per country")
+    args = parser.parse_args()
+    if args.reference and not args.climatology:
+        parser.error("--reference requires --climatology")
+    return args
+
+
+def main(args):
+    """Main function to execute the script."""
+    configs = {country: load_config(country) for country in args.countries}
+
+    # Open the dataset once and plan a download of every river once
+    glw = Geoglows()
+    dataset = glw.get_bucket()
+    plan = plan_download(dataset, configs)
+    report_plan(glw, dataset, plan)
+    if args.dry_run:
+        return
+
+    print("Downloading")
+    download_data(glw, dataset, plan, full=args.full, export_csv=args.export_csv)
+    print("Downloaded")
+
+    # Compute the SDI and the maps of every country from the shared store
+    run_countries(glw, plan, args)
+
+
+
+if __name__ == "__main__":
+    main(parse_args())
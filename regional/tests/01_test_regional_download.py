@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import zarr
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(os.path.abspath(os.path.join(root, '..', '..', 'tests')))
+    import main as regional
+    from helpers import build_store, CountingStore
+
+    configs = {country: regional.load_config(country) for country in regional.COUNTRIES}
+    rivids = set()
+    for country, config in configs.items():
+        csv = regional.country_path(country, config.COMIDS_PATH)
+        rivids.update(pd.read_csv(csv)['comid'].dropna().astype(np.int64))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retrospective.zarr")
+        build_store(path, sorted(rivids), end="1991-12-31")
+        store = CountingStore(zarr.DirectoryStore(path))
+        glw = regional.Geoglows(store=store)
+        dataset = glw.get_bucket()
+        plan = regional.plan_download(dataset, configs)
+        regional.DAT_DIR = os.path.join(tmp, "historical")
+
+        # One download per country
+        store.reads = 0
+        start = time.perf_counter()
+        separate = {country: glw.get_data(ds=dataset, comids=plan.subset(country), chunk_aligned=True)
+                    for country in plan.requests}
+        separate_time = time.perf_counter() - start
+        separate_reads = store.reads
+
+        # A single download of the union into the shared store
+        store.reads = 0
+        start = time.perf_counter()
+        regional.download_data(glw, dataset, plan, full=True)
+        union_time = time.perf_counter() - start
+        union_reads = store.reads
+
+        # Every country reads its rivers from the shared store
+        cube = glw.open_cube(dir_path=regional.DAT_DIR)
+        for country in plan.requests:
+            values, comids, dates = regional.select_cube(cube, plan.subset(country))
+            expected = separate[country][comids]
+            np.testing.assert_array_equal(values, expected.to_numpy(dtype=np.float32))
+            assert (dates == expected.index).all()
+        assert union_reads <= separate_reads
+
+        report = plan.report(glw, dataset)
+        assert report['fetched'] == len(cube[1])
+        assert report['fetches_saved'] == report['requested'] - report['fetched']
+
+        print("Every country reads the same data from the shared store")
+        print(f"Fetches: requested {report['requested']}, fetched {report['fetched']}, "
+              f"saved {report['fetches_saved']}")
+        print(f"Chunks read: per country {separate_reads}, union {union_reads}")
+        print(f"Download time: per country {separate_time:.2f} s, union {union_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
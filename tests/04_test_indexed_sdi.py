@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import tracemalloc
+import pandas as pd
+from helpers import country_dir, DATA_COUNTRY
+
+
+def load_histories(dir_path: str) -> list:
+    """Read every monthly history in dir_path as a compute_overall input."""
+    histories = []
+    for file_name in sorted(os.listdir(dir_path)):
+        data = pd.read_csv(os.path.join(dir_path, file_name), sep=",", index_col=0)
+        data.index = pd.to_datetime(data.index)
+        histories.append(pd.DataFrame({
+            'year': data.index.year,
+            'month': data.index.month,
+            'day': data.index.day,
+            'value': data.iloc[:, 0].to_numpy()
+        }))
+    return histories
+
+
+def run(nlb, histories: list, method: str) -> tuple:
+    """Return the elapsed time and peak traced memory of one method."""
+    start = time.perf_counter()
+    for streamflow in histories:
+        nlb.compute_overall(streamflow.copy(), method=method)
+    elapsed = time.perf_counter() - start
+
+    # Memory is traced on a separate pass to keep the timing clean
+    tracemalloc.start()
+    for streamflow in histories:
+        nlb.compute_overall(streamflow.copy(), method=method)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.nalbantis import Nalbantis
+
+    # Monthly histories (e.g. the 407-month Chile series)
+    dir_path = os.path.join(country_dir(DATA_COUNTRY), 'data', 'historical')
+    assert os.path.isdir(dir_path) and os.listdir(dir_path), f"No historical data in {dir_path}"
+    histories = load_histories(dir_path)
+
+    # Both methods must give the same values
+    nlb = Nalbantis()
+    for streamflow in histories:
+        merged = nlb.compute_overall(streamflow.copy(), method="merge")
+        indexed = nlb.compute_overall(streamflow.copy(), method="indexed")
+        pd.testing.assert_frame_equal(merged, indexed)
+    print(f"Indexed SDI matches merged SDI for {len(histories)} series")
+
+    # Micro-benchmark
+    for method in ["merge", "indexed"]:
+        elapsed, peak = run(nlb, histories, method)
+        print(f"{method}: {elapsed:.2f} s, "
+              f"{1000 * elapsed / len(histories):.2f} ms/series, "
+              f"peak {peak / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
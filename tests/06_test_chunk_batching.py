@@ -0,0 +1,51 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import xarray as xr
+import zarr
+from helpers import build_store, CountingStore
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.geoglows import Geoglows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retrospective.zarr")
+        build_store(path, 1000, end="1993-12-31")
+
+        # COMIDs scattered over the rivid axis, in random order
+        rng = np.random.default_rng(1)
+        rivids = xr.open_zarr(path).rivid.values
+        comids = list(rng.choice(rivids[:500], size=100, replace=False))
+
+        results = {}
+        for aligned in [False, True]:
+            store = CountingStore(zarr.DirectoryStore(path))
+            glw = Geoglows(store=store)
+            dataset = glw.get_bucket()
+            store.reads = 0
+            results[aligned] = glw.get_data(
+                ds=dataset, comids=comids, batch_size=10, chunk_aligned=aligned)
+            print(f"chunk_aligned={aligned}: {len(glw.batch_times)} batches, "
+                  f"{store.reads} chunk reads")
+            assert list(results[aligned].columns) == comids
+
+        pd.testing.assert_frame_equal(results[False], results[True])
+        print("Chunk-aligned extraction matches fixed batches")
+
+        # Dry-run report for a station list
+        csv = os.path.join(tmp, "Esta_Test.csv")
+        pd.DataFrame({'comid': comids}).to_csv(csv, index=False)
+        report = Geoglows(store=path).dry_run(xr.open_zarr(path), csv, batch_size=10)
+        print(report)
+        assert report['chunk_aligned_chunks'] == 5
+        assert report['chunk_aligned_chunks'] <= report['fixed_chunks']
+
+
+if __name__ == "__main__":
+    main()
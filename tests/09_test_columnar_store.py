@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+def synthetic_data(n_stations: int, n_months: int = 407) -> pd.DataFrame:
+    """Build a wide float32 monthly streamflow DataFrame like get_data returns."""
+    rng = np.random.default_rng(42)
+    dates = pd.date_range("1991-01-01", periods=n_months, freq="MS", name="time")
+    values = rng.gamma(2.0, 10.0, size=(n_months, n_stations)).astype(np.float32)
+    columns = pd.Index(np.arange(n_stations) + 600000000, name="rivid")
+    return pd.DataFrame(values, index=dates, columns=columns)
+
+
+def timed(function, *args, **kwargs) -> tuple:
+    """Return the result and elapsed time of a call."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def dir_size(dir_path: str) -> int:
+    """Return the total size of the files in a directory."""
+    return sum(os.path.getsize(os.path.join(dir_path, name)) for name in os.listdir(dir_path))
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.geoglows import Geoglows
+
+    glw = Geoglows(store={})
+    for n_stations in [233, 1500]:
+        data = synthetic_data(n_stations)
+        comid = data.columns[n_stations // 2]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_dir = os.path.join(tmp, "csv")
+            tsv_dir = os.path.join(tmp, "tsv")
+            col_dir = os.path.join(tmp, "columnar")
+            for dir_path in [csv_dir, tsv_dir, col_dir]:
+                os.makedirs(dir_path)
+
+            # Write
+            _, csv_write = timed(glw.save_data, data, "individual", csv_dir)
+            _, tsv_write = timed(glw.save_format_data, data, "individual", tsv_dir)
+            _, col_write = timed(glw.save_data, data, "columnar", col_dir)
+
+            # Whole-matrix and single-column reads
+            csv_data, csv_read = timed(glw.read_data, csv_dir)
+            col_data, col_read = timed(glw.read_data, col_dir)
+            _, csv_column = timed(glw.read_data, csv_dir, [comid])
+            col_one, col_column = timed(glw.read_data, col_dir, [comid])
+
+            pd.testing.assert_frame_equal(col_data, data, check_freq=False)
+            pd.testing.assert_frame_equal(
+                csv_data.astype(np.float32), data, check_freq=False)
+            assert list(col_one.columns) == [comid]
+
+            print(f"{n_stations} stations:")
+            print(f"  write: csv+tsv {csv_write + tsv_write:.2f} s, columnar {col_write:.3f} s")
+            print(f"  read all: csv {csv_read:.2f} s, columnar {col_read:.3f} s")
+            print(f"  read one: csv {csv_column:.4f} s, columnar {col_column:.4f} s")
+            print(f"  size: csv+tsv {(dir_size(csv_dir) + dir_size(tsv_dir)) / 1e6:.1f} MB, "
+                  f"columnar {dir_size(col_dir) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
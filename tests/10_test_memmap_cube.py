@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+
+def synthetic_data(n_stations: int, n_months: int = 407) -> pd.DataFrame:
+    """Build a wide float32 monthly streamflow DataFrame like get_data returns."""
+    rng = np.random.default_rng(42)
+    dates = pd.date_range("1991-01-01", periods=n_months, freq="MS", name="time")
+    values = rng.gamma(2.0, 10.0, size=(n_months, n_stations)).astype(np.float32)
+    columns = pd.Index(np.arange(n_stations) + 600000000, name="rivid")
+    return pd.DataFrame(values, index=dates, columns=columns)
+
+
+def traced(function, *args) -> tuple:
+    """Return the result, elapsed time and peak traced memory of a call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.geoglows import Geoglows
+    from modules.nalbantis import Nalbantis
+
+    glw = Geoglows(store={})
+    nlb = Nalbantis()
+
+    def sdi_from_frame(dir_path):
+        data = glw.read_data(dir_path)
+        return nlb.compute_latest(data)
+
+    def sdi_from_cube(dir_path):
+        values, comids, dates = glw.open_cube(dir_path)
+        return nlb.compute_latest_array(values, dates.month.to_numpy())
+
+    for n_stations in [1500, 10000]:
+        data = synthetic_data(n_stations)
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_dir = os.path.join(tmp, "csv")
+            col_dir = os.path.join(tmp, "columnar")
+            for dir_path in [csv_dir, col_dir]:
+                os.makedirs(dir_path)
+            glw.save_data(data, "columnar", col_dir)
+            glw.save_data(data, "memmap", col_dir)
+            if n_stations <= 1500:
+                glw.save_data(data, "individual", csv_dir)
+
+            # The cube is opened without copying it
+            values, comids, dates = glw.open_cube(col_dir)
+            assert isinstance(values, np.memmap) and values.dtype == np.float32
+            assert list(comids) == list(data.columns)
+            np.testing.assert_array_equal(values, data.to_numpy())
+
+            expected = nlb.compute_latest(data)
+            (latest, has_data), cube_time, cube_peak = traced(sdi_from_cube, col_dir)
+            np.testing.assert_allclose(latest[has_data], expected.to_numpy())
+            _, parquet_time, parquet_peak = traced(sdi_from_frame, col_dir)
+
+            print(f"{n_stations} stations:")
+            if n_stations <= 1500:
+                _, csv_time, csv_peak = traced(sdi_from_frame, csv_dir)
+                print(f"  csv:     {csv_time:.2f} s, peak {csv_peak / 1e6:.1f} MB")
+            print(f"  parquet: {parquet_time:.2f} s, peak {parquet_peak / 1e6:.1f} MB")
+            print(f"  memmap:  {cube_time:.2f} s, peak {cube_peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
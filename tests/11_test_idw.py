@@ -0,0 +1,86 @@
+import sys
+import os
+import glob
+import time
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+import rasterio
+from helpers import country_dir, DATA_COUNTRY
+
+
+def compare(grids: np.ndarray, idw, tif_path: str) -> float:
+    """Return the largest difference with a reference TIF on its valid cells."""
+    with rasterio.open(tif_path) as src:
+        reference = src.read(1, masked=True)
+        transform = src.transform
+    col0 = int(round((transform.c - idw.transform.c) / idw.resolution))
+    row0 = int(round((idw.transform.f - transform.f) / idw.resolution))
+    grid = grids[row0:row0 + reference.shape[0], col0:col0 + reference.shape[1]]
+    return float(np.abs(grid - reference.filled(np.nan))[~reference.mask].max())
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir(DATA_COUNTRY)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from modules.idw import IDW
+    from main import GRID_X_RANGE, GRID_Y_RANGE
+
+    idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE)
+    scales = ["1", "3", "6", "9", "12"]
+
+    # Parity with the TIFs written by generate_tif.R in previous runs
+    txt_files = sorted(glob.glob(os.path.join(country, 'data', 'index', 'txt', '*.csv')))
+    assert txt_files, f"No published outputs in {country}"
+    checked = 0
+    for txt_file in txt_files:
+        sdi = pd.read_csv(txt_file)
+        grids = idw.interpolate(sdi.Lon.to_numpy(), sdi.Lat.to_numpy(), sdi[scales].to_numpy())
+        name = os.path.basename(txt_file)[:-4]
+        for grid, scale in zip(grids, scales):
+            tif_path = os.path.join(country, 'data', 'index', 'tif', f'{name}_{int(scale):02d}.tif')
+            if os.path.exists(tif_path):
+                difference = compare(grid, idw, tif_path)
+                assert difference < 1e-5, difference
+                print(f"{name} SDI-{scale}: max difference with R {difference:.2e}")
+                checked += 1
+    assert checked, f"No published GeoTIFFs in {country}"
+
+    # Benchmark: five scales in one pass against five Rscript calls
+    rng = np.random.default_rng(0)
+    n_stations = 1500
+    sdi = pd.DataFrame({
+        'Lon': rng.uniform(*GRID_X_RANGE, n_stations),
+        'Lat': rng.uniform(*GRID_Y_RANGE, n_stations),
+    })
+    for scale in scales:
+        sdi[scale] = rng.normal(size=n_stations).round(3)
+
+    start = time.perf_counter()
+    grids = idw.interpolate(sdi.Lon.to_numpy(), sdi.Lat.to_numpy(), sdi[scales].to_numpy())
+    python_time = time.perf_counter() - start
+    print(f"Python IDW, {n_stations} stations, 5 scales: {python_time:.2f} s")
+
+    if shutil.which("Rscript") is None:
+        print("Rscript not found, skipping the R benchmark")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'sdi.csv')
+        sdi.to_csv(csv_path, index=False)
+        start = time.perf_counter()
+        for grid, scale in zip(grids, scales):
+            tif_path = os.path.join(tmp, f'{scale}.tif')
+            subprocess.run(["Rscript", "generate_tif.R", csv_path, tif_path, f"X{scale}"],
+                           cwd=country, check=True)
+            print(f"SDI-{scale}: max difference with R {compare(grid, idw, tif_path):.2e}")
+        r_time = time.perf_counter() - start
+    print(f"Rscript IDW: {r_time:.2f} s, saved {r_time - python_time:.2f} s per country")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from modules.idw import IDW
+    from main import GRID_X_RANGE, GRID_Y_RANGE
+
+    rng = np.random.default_rng(0)
+    n_stations = 1500
+    lon = rng.uniform(*GRID_X_RANGE, n_stations)
+    lat = rng.uniform(*GRID_Y_RANGE, n_stations)
+    values = rng.normal(size=(n_stations, 5))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, cache_dir=tmp)
+
+        # First run computes and stores the weights
+        start = time.perf_counter()
+        cold = idw.interpolate(lon, lat, values)
+        cold_time = time.perf_counter() - start
+        assert len(os.listdir(tmp)) == 1
+
+        # Later runs only load them and apply one sparse product per scale
+        start = time.perf_counter()
+        warm = idw.interpolate(lon, lat, values)
+        warm_time = time.perf_counter() - start
+        assert np.array_equal(cold, warm, equal_nan=True)
+        print(f"IDW, {n_stations} stations, 5 scales: {cold_time:.2f} s cold, {warm_time:.2f} s cached")
+
+        # Another station set, grid or power gets its own entry
+        IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, power=3.0, cache_dir=tmp).get_weights(lon, lat)
+        idw.get_weights(lon[1:], lat[1:])
+        assert len(os.listdir(tmp)) == 3
+
+        # NaN stations are left out by renormalizing the cached weights,
+        # which matches rebuilding the weights without them
+        missing = rng.random(size=values.shape) < 0.2
+        values[missing] = np.nan
+        grids = idw.interpolate(lon, lat, values)
+        for i in range(values.shape[1]):
+            valid = ~missing[:, i]
+            expected = idw.compute_weights(lon[valid], lat[valid])
+            expected = idw.interpolate(lon[valid], lat[valid], values[valid, i], weights=expected)
+            assert np.allclose(grids[i], expected[0], equal_nan=True)
+        assert len(os.listdir(tmp)) == 3
+        print("NaN renormalization matches rebuilt weights")
+
+        # The nearest stations (opt-in) keep the matrices sparse, and the
+        # least recently used ones are removed beyond the cache size
+        nearest = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, neighbours=12, cache_dir=tmp)
+        assert nearest.get_weights(lon, lat).nnz == idw.get_weights(lon, lat).shape[0] * 12
+        small = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, cache_dir=tmp, cache_size=2)
+        by_use = sorted(os.listdir(tmp), key=lambda name: os.path.getmtime(os.path.join(tmp, name)))
+        small.get_weights(lon[2:], lat[2:])
+        newest = f"idw_{small.cache_key(lon[2:], lat[2:])}.npz"
+        assert sorted(os.listdir(tmp)) == sorted([by_use[-1], newest])
+        print(f"Sparse weights ({nearest.neighbours} neighbours) with a bounded cache")
+
+
+if __name__ == "__main__":
+    main()
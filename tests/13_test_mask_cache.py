@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import rasterio
+import rasterio.mask
+import geopandas as gpd
+from helpers import country_dir
+
+
+def to_grid(idw, array: np.ndarray, transform) -> np.ndarray:
+    """Place a cropped array back on the full grid."""
+    grid = np.full(idw.shape, np.nan, dtype=array.dtype)
+    row0 = int(round((idw.transform.f - transform.f) / idw.resolution))
+    col0 = int(round((transform.c - idw.transform.c) / idw.resolution))
+    grid[row0:row0 + array.shape[0], col0:col0 + array.shape[1]] = array
+    return grid
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from modules.idw import IDW
+    from modules.boundary import Boundary
+    from main import GRID_X_RANGE, GRID_Y_RANGE, SHAPEFILE
+
+    shapefile = os.path.join(country, SHAPEFILE)
+    if not os.path.exists(shapefile):
+        print(f"{SHAPEFILE} not found, skipping")
+        return
+    gdf = gpd.read_file(shapefile)
+    boundary = Boundary(shapefile)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, cache_dir=tmp)
+
+        # First call rasterizes the shapefile, later calls only load the mask
+        start = time.perf_counter()
+        window, outside = idw.get_mask(boundary)
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        cached_window, cached_outside = idw.get_mask(boundary)
+        warm_time = time.perf_counter() - start
+        assert window == cached_window
+        assert np.array_equal(outside, cached_outside)
+        print(f"Mask {outside.shape}: {cold_time:.3f} s cold, {warm_time:.4f} s cached")
+
+        # The TIF written with the cached mask keeps the same cells as masking
+        # the full grid with the shapefile as plot_raster did before (the crop
+        # snaps to the nearest cell edge as in R, so only NaN borders differ)
+        rng = np.random.default_rng(0)
+        grid = rng.normal(size=(1,) + idw.shape)
+        full_path = os.path.join(tmp, 'full.tif')
+        idw.save_tif(grid[0], idw.transform, full_path)
+        with rasterio.open(full_path) as src:
+            expected, expected_transform = rasterio.mask.mask(src, gdf.geometry, crop=True)
+        expected = np.where(expected[0] == src.nodata, np.nan, expected[0])
+
+        masked, transform = idw.mask(grid, boundary)
+        masked_path = os.path.join(tmp, 'masked.tif')
+        idw.save_tif(masked[0], transform, masked_path)
+        with rasterio.open(masked_path) as src:
+            result = src.read(1, masked=True).filled(np.nan)
+            result[outside] = np.nan
+        assert np.array_equal(to_grid(idw, result, transform),
+                              to_grid(idw, expected.astype(np.float32), expected_transform),
+                              equal_nan=True)
+        print("Cached mask matches rasterio.mask.mask")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import rasterio
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from modules.idw import IDW
+    from main import GRID_X_RANGE, GRID_Y_RANGE, read_raster
+
+    idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE)
+    rng = np.random.default_rng(0)
+    grids = rng.normal(size=(5,) + idw.shape)
+    grids[:, :3] = np.nan
+    scales = [1, 3, 6, 9, 12]
+    descriptions = [f"SDI-{scale}" for scale in scales]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Write the five single-band files and the multi-band file
+        single_files = [os.path.join(tmp, f'single_{scale:02d}.tif') for scale in scales]
+        for grid, single_file in zip(grids, single_files):
+            idw.save_tif(grid, idw.transform, single_file)
+        multi_file = os.path.join(tmp, 'multi.tif')
+        idw.save_tif(grids, idw.transform, multi_file, descriptions=descriptions)
+
+        with rasterio.open(multi_file) as src:
+            assert src.count == 5
+            assert list(src.descriptions) == descriptions
+            assert src.profile['tiled']
+            assert src.profile['compress'] == 'lzw'
+
+        # Same values and transform with one open instead of five
+        outside = np.zeros(idw.shape, dtype=bool)
+        repeat = 50
+        start = time.perf_counter()
+        for _ in range(repeat):
+            single = [read_raster(single_file, None, outside) for single_file in single_files]
+        single_time = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            bands, transform = read_raster(multi_file, None, outside)
+        multi_time = (time.perf_counter() - start) / repeat
+
+        assert transform == single[0][1]
+        assert np.array_equal(bands, np.concatenate([band for band, _ in single]), equal_nan=True)
+        size_single = sum(os.path.getsize(single_file) for single_file in single_files)
+        size_multi = os.path.getsize(multi_file)
+        print(f"Five single-band files: {single_time * 1000:.2f} ms, {size_single / 1024:.0f} KiB")
+        print(f"One multi-band file: {multi_time * 1000:.2f} ms, {size_multi / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
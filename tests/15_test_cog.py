@@ -0,0 +1,73 @@
+import sys
+import os
+import glob
+import time
+import tempfile
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from helpers import country_dir
+
+
+def read_latency(path: str, window: Window, out_shape: tuple = None, repeat: int = 50) -> float:
+    """Average time (ms) to open a file and read one window of band 1."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with rasterio.open(path) as src:
+            src.read(1, window=window, out_shape=out_shape)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from modules.idw import IDW, NODATA
+    from main import GRID_X_RANGE, GRID_Y_RANGE
+
+    # The TIFs written by generate_tif.R are not cloud optimized
+    idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE)
+    for tif_path in sorted(glob.glob(os.path.join(country, 'data', 'index', 'tif', '*.tif'))):
+        print(f"{os.path.basename(tif_path)}: {idw.validate_cog(tif_path)}")
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Operational grid and a finer one, to see how both layouts scale
+        for resolution in [0.25, 0.02]:
+            idw = IDW(x_range=GRID_X_RANGE, y_range=GRID_Y_RANGE, resolution=resolution)
+            grid = rng.normal(size=idw.shape).cumsum(axis=0).cumsum(axis=1) / idw.shape[0]
+            grid[:idw.shape[0] // 10] = np.nan
+
+            # Layout of the R writeRaster output: stripped, no overviews
+            legacy_path = os.path.join(tmp, f'legacy_{resolution}.tif')
+            profile = {
+                'driver': 'GTiff', 'dtype': 'float32', 'nodata': NODATA,
+                'width': idw.shape[1], 'height': idw.shape[0], 'count': 1,
+                'transform': idw.transform, 'compress': 'lzw',
+            }
+            with rasterio.open(legacy_path, 'w', **profile) as dst:
+                dst.write(np.where(np.isfinite(grid), grid, NODATA).astype(np.float32), 1)
+
+            cog_path = os.path.join(tmp, f'cog_{resolution}.tif')
+            idw.save_tif(grid, idw.transform, cog_path, cog=True)
+            assert idw.validate_cog(cog_path) == [], idw.validate_cog(cog_path)
+            assert os.path.exists(os.path.join(tmp, f'cog_{resolution}.tfw'))
+            with rasterio.open(cog_path) as src, rasterio.open(legacy_path) as ref:
+                assert np.array_equal(src.read(1), ref.read(1))
+                assert src.transform == ref.transform
+
+            # Partial window (a tenth of each side) and a quarter-size preview
+            ny, nx = idw.shape
+            window = Window(nx // 2, ny // 2, max(nx // 10, 1), max(ny // 10, 1))
+            preview = (ny // 4, nx // 4)
+            print(f"Grid {ny}x{nx} at {resolution}°")
+            for name, path in [('legacy', legacy_path), ('COG', cog_path)]:
+                print(f"  {name:6s}: {os.path.getsize(path) / 1024:8.1f} KiB, "
+                      f"window {read_latency(path, window):.3f} ms, "
+                      f"preview {read_latency(path, None, preview):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import time
+import numpy as np
+from matplotlib.colors import to_rgba
+
+
+def color(pixelValue: float) -> str:
+    """The if/elif colour function previously defined in main.py."""
+    if -10.0 <= pixelValue < -2.75:
+        return '#890002'
+    elif -2.75 <= pixelValue < -2.5:
+        return '#a10001'
+    elif -2.5 <= pixelValue < -2.25:
+        return '#ca0000'
+    elif -2.25 <= pixelValue < -2.0:
+        return '#e50201'
+    elif -2.0 <= pixelValue < -1.75:
+        return '#f41f0a'
+    elif -1.75 <= pixelValue < -1.5:
+        return '#f1651d'
+    elif -1.5 <= pixelValue < -1.25:
+        return '#ed9028'
+    elif -1.25 <= pixelValue < -1.0:
+        return '#e9aa2d'
+    elif -1.0 <= pixelValue < -0.75:
+        return '#dfbf77'
+    elif -0.75 <= pixelValue < -0.25:
+        return '#c8c8c8'
+    elif -0.25 <= pixelValue < 0.25:
+        return '#c8c8c8'
+    elif 0.25 <= pixelValue < 0.5:
+        return '#54ba57'
+    elif 0.5 <= pixelValue < 0.75:
+        return '#009e3c'
+    elif 0.75 <= pixelValue < 1.0:
+        return '#00a1df'
+    elif 1.0 <= pixelValue < 1.25:
+        return '#00b0df'
+    elif 1.25 <= pixelValue < 1.5:
+        return '#00b8e0'
+    elif 1.5 <= pixelValue < 1.75:
+        return '#009fdf'
+    elif 1.75 <= pixelValue < 2.0:
+        return '#007cdf'
+    elif 2.0 <= pixelValue < 2.25:
+        return '#0062df'
+    elif 2.25 <= pixelValue < 2.5:
+        return '#7100d0'
+    elif 2.5 <= pixelValue < 2.75:
+        return '#8900b0'
+    elif 2.75 <= pixelValue <= 10.0:
+        return '#a00090'
+    else:
+        return "none"
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.palette import Palette, SDI_BOUNDS
+
+    palette = Palette()
+
+    # Same classes as the if/elif chain, including every bin edge
+    values = np.concatenate([
+        np.round(np.arange(-11, 11, 0.001), 3), SDI_BOUNDS,
+        np.nextafter(SDI_BOUNDS, -np.inf), [np.nan, -np.inf, np.inf]])
+    expected = [color(value) for value in values]
+    assert [palette.color(value) for value in values] == expected
+    expected_rgba = np.array([
+        (0, 0, 0, 0) if c == "none" else np.round(np.array(to_rgba(c)) * 255)
+        for c in expected], dtype=np.uint8)
+    assert np.array_equal(palette.to_rgba(values), expected_rgba)
+
+    # The colormap and norm give the same colours on the colorbar range
+    cmap, norm = palette.get_cmap(-3, 3)
+    inside = values[(values >= -3) & (values < 3)]
+    rgba = np.round(cmap(norm(inside)) * 255).astype(np.uint8)
+    assert np.array_equal(rgba, palette.to_rgba(inside))
+    assert np.allclose(cmap.get_under(), to_rgba(color(-5)))
+    assert np.allclose(cmap.get_over(), to_rgba(color(5)))
+
+    # Colouring a full raster
+    raster = np.random.default_rng(0).normal(size=(500, 500))
+    start = time.perf_counter()
+    [color(value) for value in raster.ravel()]
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    palette.to_rgba(raster)
+    lut_time = time.perf_counter() - start
+    print(f"{raster.size} pixels: if/elif {loop_time:.3f} s, lookup table {lut_time:.4f} s")
+
+
+if __name__ == "__main__":
+    main()
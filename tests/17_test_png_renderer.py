@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+import resource
+import subprocess
+import tempfile
+import numpy as np
+from helpers import country_dir
+
+
+def render(mode: str, out_dir: str) -> None:
+    """Render five maps with one of the PNG paths and report time and RSS."""
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    os.chdir(country)
+    import geopandas as gpd
+    import main
+    from modules.idw import IDW
+    from modules.boundary import Boundary
+    from modules.render import Renderer
+
+    idw = IDW(x_range=main.GRID_X_RANGE, y_range=main.GRID_Y_RANGE)
+    window, outside = idw.get_mask(Boundary(main.SHAPEFILE))
+    transform = idw.window_transform(window)
+    rng = np.random.default_rng(0)
+    bands = rng.normal(size=(5,) + outside.shape).cumsum(axis=1).cumsum(axis=2) / 10
+    bands[:, outside] = np.nan
+    gdf = gpd.read_file(main.SHAPEFILE)
+
+    start = time.perf_counter()
+    if mode == "direct":
+        renderer = Renderer(main.PALETTE, gdf, transform, outside.shape)
+    for i, band in enumerate(bands):
+        png_file = os.path.join(out_dir, f'{mode}_{i}.png')
+        if mode == "direct":
+            renderer.save(band, png_file, title=f"SDI {i}")
+        else:
+            main.plot_image(band[None], transform, gdf, png_file, main.PALETTE, f"{i:02d}")
+    elapsed = (time.perf_counter() - start) / len(bands)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:12s}: {elapsed * 1000:7.1f} ms per image, peak RSS {rss:.0f} MiB")
+
+
+def main():
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    from main import SHAPEFILE
+    if not os.path.exists(os.path.join(country, SHAPEFILE)):
+        print(f"{SHAPEFILE} not found, skipping")
+        return
+
+    # Each path runs in its own process so the peak RSS is not shared
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ["publication", "direct"]:
+            subprocess.run([sys.executable, __file__, mode, tmp], check=True)
+        from PIL import Image
+        for i in range(5):
+            image = Image.open(os.path.join(tmp, f'direct_{i}.png'))
+            assert image.mode == 'RGBA' and image.height > 400
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        render(sys.argv[1], sys.argv[2])
+    else:
+        main()
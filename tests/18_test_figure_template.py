@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import geopandas as gpd
+import matplotlib.pyplot as plt
+from PIL import Image
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    os.chdir(country)
+    import main as pipeline
+    from modules.idw import IDW
+    from modules.boundary import Boundary
+    from modules.render import FigureTemplate
+
+    if not os.path.exists(pipeline.SHAPEFILE):
+        print(f"{pipeline.SHAPEFILE} not found, skipping")
+        return
+    idw = IDW(x_range=pipeline.GRID_X_RANGE, y_range=pipeline.GRID_Y_RANGE)
+    window, outside = idw.get_mask(Boundary(pipeline.SHAPEFILE))
+    transform = idw.window_transform(window)
+    rng = np.random.default_rng(0)
+    bands = rng.normal(size=(5,) + outside.shape).cumsum(axis=1).cumsum(axis=2) / 10
+    bands[:, outside] = np.nan
+    gdf = gpd.read_file(pipeline.SHAPEFILE)
+    agg_times = ["01", "03", "06", "09", "12"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # One figure per scale
+        start = time.perf_counter()
+        for band, aggTime in zip(bands, agg_times):
+            pipeline.plot_image(band[None], transform, gdf, os.path.join(tmp, f'single_{aggTime}.png'),
+                                pipeline.PALETTE, aggTime)
+        single_time = (time.perf_counter() - start) / len(bands)
+
+        # One figure for the five scales
+        start = time.perf_counter()
+        template = FigureTemplate(pipeline.PALETTE, gdf, transform, outside.shape,
+                                  pipeline.PLOT_XLIM, pipeline.PLOT_YLIM)
+        for band, aggTime in zip(bands, agg_times):
+            template.save(band, os.path.join(tmp, f'template_{aggTime}.png'),
+                          title=pipeline.plot_title(aggTime))
+        template.close()
+        template_time = (time.perf_counter() - start) / len(bands)
+
+        # Same images, and no figure left open
+        for aggTime in agg_times:
+            single = np.asarray(Image.open(os.path.join(tmp, f'single_{aggTime}.png')))
+            reused = np.asarray(Image.open(os.path.join(tmp, f'template_{aggTime}.png')))
+            assert np.array_equal(single, reused), aggTime
+        assert plt.get_fignums() == []
+        print(f"Figure per scale: {single_time * 1000:.0f} ms, template: {template_time * 1000:.0f} ms per image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import shapely
+import geopandas as gpd
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    os.chdir(country)
+    import main as pipeline
+    from modules.boundary import Boundary
+    from modules.idw import IDW
+    from modules.render import FigureTemplate
+
+    if not os.path.exists(pipeline.SHAPEFILE):
+        print(f"{pipeline.SHAPEFILE} not found, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        shapefile = gpd.read_file(pipeline.SHAPEFILE)
+        shapefile_time = time.perf_counter() - start
+
+        # The first use writes every level of detail to one GeoParquet file
+        Boundary(pipeline.SHAPEFILE, cache_dir=tmp).get(0.0)
+        assert len([f for f in os.listdir(tmp) if f.endswith('.parquet')]) == 1
+
+        # Later runs read a single level from it
+        boundary = Boundary(pipeline.SHAPEFILE, cache_dir=tmp)
+        vertices = []
+        for tolerance in boundary.tolerances:
+            start = time.perf_counter()
+            level = boundary.get(tolerance)
+            elapsed = time.perf_counter() - start
+            vertices.append(shapely.get_num_coordinates(level.geometry.values).sum())
+            print(f"Tolerance {tolerance:.3f}°: {vertices[-1]:7d} vertices, read in {elapsed * 1000:.1f} ms")
+        print(f"Shapefile: read in {shapefile_time * 1000:.1f} ms")
+        assert vertices[0] == shapely.get_num_coordinates(shapefile.geometry.values).sum()
+        assert all(a > b for a, b in zip(vertices, vertices[1:]))
+        assert boundary.get(0.0).geometry.geom_equals(shapefile.geometry).all()
+
+        # Level picked for the output pixel size
+        assert boundary.for_resolution(0) is boundary.get(0.0)
+        assert boundary.for_resolution(0.004) is boundary.get(0.001)
+        assert boundary.for_resolution(0.25) is boundary.get(0.02)
+
+        # Drawing the maps with the simplified boundary
+        idw = IDW(x_range=pipeline.GRID_X_RANGE, y_range=pipeline.GRID_Y_RANGE)
+        window, outside = idw.get_mask(boundary)
+        transform = idw.window_transform(window)
+        grid = np.where(outside, np.nan, 0.0)
+        pixel_size = (pipeline.PLOT_YLIM[1] - pipeline.PLOT_YLIM[0]) / pipeline.MAP_HEIGHT
+        for name, gdf in [('original', boundary.get(0.0)), ('simplified', boundary.for_resolution(pixel_size))]:
+            template = FigureTemplate(pipeline.PALETTE, gdf, transform, outside.shape,
+                                      pipeline.PLOT_XLIM, pipeline.PLOT_YLIM)
+            start = time.perf_counter()
+            for i in range(5):
+                template.save(grid, os.path.join(tmp, f'{name}_{i}.png'))
+            template.close()
+            print(f"Map with the {name} boundary: {(time.perf_counter() - start) / 5 * 1000:.0f} ms per image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    country = country_dir()
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    sys.path.append(country)
+    os.chdir(country)
+    import main as pipeline
+    from modules.boundary import Boundary
+    from modules.idw import IDW
+    from modules.render import Renderer, FigureTemplate, MapPool
+
+    if not os.path.exists(pipeline.SHAPEFILE):
+        print(f"{pipeline.SHAPEFILE} not found, skipping")
+        return
+    boundary = Boundary(pipeline.SHAPEFILE)
+    idw = IDW(x_range=pipeline.GRID_X_RANGE, y_range=pipeline.GRID_Y_RANGE)
+    window, outside = idw.get_mask(boundary)
+    transform = idw.window_transform(window)
+    rng = np.random.default_rng(0)
+    bands = rng.normal(size=(5,) + outside.shape).cumsum(axis=1).cumsum(axis=2) / 10
+    bands[:, outside] = np.nan
+    gdf = boundary.for_resolution((pipeline.PLOT_YLIM[1] - pipeline.PLOT_YLIM[0]) / pipeline.MAP_HEIGHT)
+
+    renderers = {
+        'publication': (FigureTemplate, (pipeline.PALETTE, gdf, transform, outside.shape,
+                                         pipeline.PLOT_XLIM, pipeline.PLOT_YLIM), {}),
+        'direct': (Renderer, (pipeline.PALETTE, gdf, transform, outside.shape),
+                   {'map_height': pipeline.MAP_HEIGHT}),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (renderer, args, kwargs) in renderers.items():
+            for workers in [1, 5]:
+                jobs = [(band, os.path.join(tmp, f'{name}_{workers}_{i}.png'), f"SDI {i}")
+                        for i, band in enumerate(bands)]
+                # The workers of the first month are kept for the next ones
+                with MapPool(renderer, args, kwargs, workers=workers) as pool:
+                    months = []
+                    for _ in range(2):
+                        start = time.perf_counter()
+                        timings = pool.render(jobs)
+                        months.append(time.perf_counter() - start)
+                per_image = ", ".join(f"{t * 1000:.0f}" for t in timings)
+                print(f"{name:11s} {workers} worker(s): {months[0]:.2f} s first month, "
+                      f"{months[1]:.2f} s next month, per image [{per_image}] ms")
+
+            # Same images whatever the number of workers
+            for i in range(len(bands)):
+                serial = np.asarray(Image.open(os.path.join(tmp, f'{name}_1_{i}.png')))
+                parallel = np.asarray(Image.open(os.path.join(tmp, f'{name}_5_{i}.png')))
+                assert np.array_equal(serial, parallel)
+
+
+if __name__ == "__main__":
+    main()
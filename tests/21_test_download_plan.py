@@ -0,0 +1,62 @@
+import sys
+import os
+import glob
+import tempfile
+import numpy as np
+import pandas as pd
+from helpers import country_dir, build_store
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.geoglows import Geoglows
+    from modules.planner import DownloadPlan
+
+    # Every station list of the country with a comid column
+    csvs = {}
+    for csv in sorted(glob.glob(os.path.join(country_dir(), 'assets', '*.csv'))):
+        if 'comid' in pd.read_csv(csv, nrows=0).columns:
+            csvs[os.path.basename(csv)] = csv
+    requests = {name: pd.read_csv(csv)['comid'].dropna().astype(np.int64).tolist()
+                for name, csv in csvs.items()}
+
+    # A second list overlapping half of the first one, as a neighbour would
+    first = next(iter(requests.values()))
+    requests['neighbour'] = first[::2] + [1, 2, 3]
+    plan = DownloadPlan(requests)
+    unique = set().union(*[set(comids) for comids in requests.values()])
+    requested = sum(len(comids) for comids in requests.values())
+    assert plan.union == sorted(unique)
+    assert plan.subset('neighbour') == sorted(set(requests['neighbour']))
+    assert set(plan.shared()) == set(first[::2]) | (set(first) & set().union(
+        *[set(comids) for name, comids in requests.items() if name not in [next(iter(requests)), 'neighbour']]))
+
+    report = plan.report()
+    assert report['requested'] == requested
+    assert report['fetched'] == len(unique)
+    assert report['fetches_saved'] == requested - len(unique)
+    assert report['fetches_saved'] == report['repeated_in_list'] + sum(
+        len(names) - 1 for names in plan.shared().values())
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+    # COMIDs missing from the dataset are left out, and the chunk-aligned
+    # batches of the union are counted once
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retrospective.zarr")
+        build_store(path, sorted(unique - {1, 2, 3}), end="1990-12-31")
+        glw = Geoglows(store=path)
+        dataset = glw.get_bucket()
+        plan = DownloadPlan(requests, available=dataset.rivid.values)
+        assert plan.missing['neighbour'] == [1, 2, 3]
+        report = plan.report(glw, dataset)
+        assert report['missing'] == 3
+        assert report['chunk_batches_union'] <= report['chunk_batches_per_list']
+        print(f"Chunk batches: per list {report['chunk_batches_per_list']}, "
+              f"union {report['chunk_batches_union']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.nalbantis import Nalbantis
+    from modules.geoglows import Geoglows
+    from modules.archive import SDIArchive
+
+    # Monthly streamflow of 1500 stations since 1991, one starting later
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1991-01-01", "2024-12-01", freq="MS", name="time")
+    comids = np.arange(1500) + 610000000
+    data = pd.DataFrame(rng.gamma(2.0, 10.0, size=(len(dates), len(comids))),
+                        index=dates, columns=pd.Index(comids, name="rivid"))
+    data.iloc[:30, 7] = np.nan
+
+    nlb = Nalbantis()
+    glw = Geoglows(store="unused")
+    with tempfile.TemporaryDirectory() as tmp:
+        glw.save_data(data=data, save_type="memmap", dir_path=tmp)
+        archive = SDIArchive(tmp)
+        start = time.perf_counter()
+        archive.build(nlb, *glw.open_cube(dir_path=tmp), block_size=512)
+        build_time = time.perf_counter() - start
+
+        # Station series match compute_overall
+        for column in [0, 7, 1499]:
+            streamflow = pd.DataFrame({
+                'year': dates.year, 'month': dates.month, 'day': dates.day,
+                'value': data.iloc[:, column].to_numpy()}).dropna().reset_index(drop=True)
+            overall = nlb.compute_overall(streamflow, method="indexed")
+            series = archive.station(comids[column]).dropna()
+            expected = overall[[f"sdi_value_{scale}m" for scale in [1, 3, 6, 9, 12]]].to_numpy()
+            assert len(series) == len(expected)
+            np.testing.assert_allclose(series.to_numpy(), expected, rtol=1e-5, atol=1e-5)
+
+        # Month slices and points match the latest SDI
+        latest = nlb.compute_latest(data)
+        month = archive.month(dates[-1])
+        np.testing.assert_allclose(month.loc[latest.index].to_numpy(), latest.to_numpy(),
+                                   rtol=1e-5, atol=1e-5)
+        point = archive.point(comids[3], "2024-12-15")
+        np.testing.assert_allclose(point.to_numpy(), latest.loc[comids[3]].to_numpy(),
+                                   rtol=1e-5, atol=1e-5)
+        assert archive.month("1991-06-01").empty
+        print("SDI archive matches compute_overall and the latest SDI")
+
+        # Monthly runs append the new months, each with the SDI of the
+        # record up to it, and keep the months already archived
+        values = data.to_numpy()
+        appended = SDIArchive(os.path.join(tmp, "appended"))
+        assert not appended.exists()
+        assert appended.update(nlb, values[:-2], comids, dates[:-2]) == len(dates) - 2
+        assert appended.exists()
+        published = appended.month(dates[-3])
+        assert appended.update(nlb, values, comids, dates) == 2
+        assert appended.update(nlb, values, comids, dates) == 0
+        assert appended.dates.equals(dates)
+        np.testing.assert_array_equal(appended.month(dates[-3]).to_numpy(), published.to_numpy())
+        for end in [len(dates) - 1, len(dates)]:
+            expected = nlb.compute_array(values[:end], dates[:end].month.to_numpy())[:, -1].T
+            np.testing.assert_allclose(appended.month(dates[end - 1]).to_numpy(), expected,
+                                       rtol=1e-5, atol=1e-5)
+        print("SDI archive appends the new months")
+
+        # A revised month (e.g. a partial month refetched) is written again,
+        # with the months after it
+        revised = values.copy()
+        revised[-1] *= 3
+        assert appended.update(nlb, revised, comids, dates) == 1
+        expected = nlb.compute_array(revised, dates.month.to_numpy())[:, -1].T
+        np.testing.assert_allclose(appended.month(dates[-1]).to_numpy(), expected,
+                                   rtol=1e-5, atol=1e-5)
+        np.testing.assert_array_equal(appended.month(dates[-3]).to_numpy(), published.to_numpy())
+        revised[-2] *= 2
+        assert appended.update(nlb, revised, comids, dates) == 2
+        print("SDI archive writes the revised months again")
+
+        # Query times, on a freshly opened archive
+        archive = SDIArchive(tmp)
+        timings = {}
+        for name, query in [('point', lambda: archive.point(comids[1000], "2010-05-01")),
+                            ('station', lambda: archive.station(comids[1000])),
+                            ('month', lambda: archive.month("2010-05-01"))]:
+            query()
+            start = time.perf_counter()
+            for _ in range(20):
+                query()
+            timings[name] = 1000 * (time.perf_counter() - start) / 20
+        print(f"Build: {build_time:.2f} s for {len(comids)} stations x {len(dates)} months")
+        print("Query: " + ", ".join(f"{name} {ms:.2f} ms" for name, ms in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
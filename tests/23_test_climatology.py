@@ -0,0 +1,103 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.nalbantis import Nalbantis
+    from modules.climatology import Climatology
+
+    # Monthly streamflow of 1500 stations since 1991, one starting later and
+    # one with a gap
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1991-01-01", "2024-12-01", freq="MS", name="time")
+    comids = np.arange(1500) + 610000000
+    values = rng.gamma(2.0, 10.0, size=(len(dates), len(comids)))
+    values[:30, 7] = np.nan
+    values[100:103, 3] = np.nan
+    months = dates.month.to_numpy()
+    nlb = Nalbantis()
+    expected, expected_has_data = nlb.compute_latest_array(values, months)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Statistics of the whole record match the batch SDI
+        clim = Climatology(tmp)
+        start = time.perf_counter()
+        clim.fit(values[:-1], comids, dates[:-1])
+        fit_time = time.perf_counter() - start
+        clim.save()
+
+        # Adding the last month to the cached statistics gives the same SDI
+        clim = Climatology(tmp)
+        assert clim.load()
+        start = time.perf_counter()
+        assert clim.update_cube(values, comids, dates) == 1
+        latest, has_data = clim.compute_latest()
+        update_time = time.perf_counter() - start
+        np.testing.assert_array_equal(has_data, expected_has_data)
+        np.testing.assert_allclose(latest, expected, rtol=1e-9, atol=1e-9)
+        print("Incremental climatology matches the batch SDI")
+
+        # A revised month (e.g. refetched) already in the statistics, or a
+        # full download, builds them again
+        clim.save()
+        revised = values.copy()
+        revised[-2] *= 0.5
+        clim = Climatology(tmp)
+        assert clim.load()
+        assert clim.update_cube(revised, comids, dates) == len(dates)
+        latest, _ = clim.compute_latest()
+        expected, _ = nlb.compute_latest_array(revised, months)
+        np.testing.assert_allclose(latest, expected, rtol=1e-9, atol=1e-9)
+        assert clim.update_cube(revised, comids, dates) == 0
+        assert clim.update_cube(revised, comids, dates, refit=True) == len(dates)
+        print("Revised months build the climatology again")
+
+        # A cache for another reference period is not used
+        assert not Climatology(tmp, reference=("1991-01", "2020-12")).load()
+
+        # Nor one for the other validity; each scale valid on its own matches
+        # the opt-in of Nalbantis
+        clim = Climatology(tmp, per_scale=True)
+        assert not clim.load()
+        clim.fit(values, comids, dates)
+        latest, has_data = clim.compute_latest()
+        expected, expected_has_data = Nalbantis(per_scale=True).compute_latest_array(values, months)
+        np.testing.assert_array_equal(has_data, expected_has_data)
+        np.testing.assert_allclose(latest, expected, rtol=1e-9, atol=1e-9)
+        print("Per-scale climatology matches the per-scale batch SDI")
+
+    # Frozen reference period: later months do not change the statistics
+    reference = ("1991-01", "2020-12")
+    clim = Climatology(reference=reference)
+    clim.fit(values, comids, dates)
+    latest, _ = clim.compute_latest()
+    means = nlb.rolling_means(values)
+    valid = np.isfinite(means[-1]) & (dates <= "2020-12-01")[:, None]
+    rows = valid & (months == months[-1])[:, None]
+    for i in range(len(means)):
+        data = np.where(rows, means[i], np.nan)
+        mean = np.nanmean(data, axis=0)
+        std = np.nanstd(data, axis=0, ddof=1)
+        np.testing.assert_allclose(latest[:, i], (means[i, -1] - mean) / std, rtol=1e-9)
+    frozen_mean = clim.mean.copy()
+    clim.update(rng.gamma(2.0, 10.0, size=len(comids)), "2025-01-01")
+    np.testing.assert_array_equal(clim.mean, frozen_mean)
+    print(f"Frozen {reference[0]} to {reference[1]} climatology matches the reference SDI")
+
+    # Benchmark: full recomputation against one monthly update
+    start = time.perf_counter()
+    nlb.compute_latest_array(values, months)
+    batch_time = time.perf_counter() - start
+    print(f"Fit: {fit_time:.2f} s, batch SDI: {1000 * batch_time:.1f} ms, "
+          f"monthly update: {1000 * update_time:.2f} ms ({len(comids)} stations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+
+def lagged_means(values: np.ndarray, scales: list) -> np.ndarray:
+    """Rolling means with one shifted sum per lag, one scale at a time."""
+    means = np.full((len(scales),) + values.shape, np.nan)
+    for i, months in enumerate(scales):
+        window_sum = values[months - 1:].astype(np.float64)
+        for lag in range(1, months):
+            window_sum += values[months - 1 - lag:values.shape[0] - lag]
+        means[i, months - 1:] = window_sum / months
+    return means
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.nalbantis import Nalbantis, RollingMeans, SCALES
+
+    # Monthly streamflow of 1500 stations since 1991, with a few gaps
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1991-01-01", "2024-12-01", freq="MS")
+    values = rng.gamma(2.0, 10.0, size=(len(dates), 1500)).astype(np.float32)
+    values[:30, 7] = np.nan
+    values[100:103, 8] = np.nan
+    nlb = Nalbantis()
+
+    # Same values as pandas rolling(window).mean(), scale by scale
+    means = nlb.rolling_means(values)
+    frame = pd.DataFrame(values.astype(np.float64))
+    for i, months in enumerate(SCALES):
+        expected = frame.rolling(window=months).mean().to_numpy()
+        np.testing.assert_allclose(means[i], expected, rtol=1e-9, atol=1e-9)
+    print("Cumulative-sum kernel matches pandas rolling means")
+
+    # Each scale is valid on its own: the 1-month mean starts on month 1
+    # and a gap only removes the windows that contain it
+    assert np.isfinite(means[0, 0, :7]).all() and np.isnan(means[-1, 10]).all()
+    assert np.isnan(means[1, 100:105, 8]).all() and np.isfinite(means[1, 105, 8])
+    streamflow = pd.DataFrame({'year': dates.year, 'month': dates.month, 'day': dates.day,
+                               'value': values[:, 0].astype(np.float64)})
+    kept = nlb.aggregate_data(streamflow.copy(), dropna=False)
+    assert len(kept) == len(dates) and kept['value_1m'].notna().all()
+    assert len(nlb.aggregate_data(streamflow.copy())) == len(dates) - 11
+
+    # Streaming updates give the same means as the whole record
+    rolling = RollingMeans(values.shape[1])
+    first = rolling.update(values[:300])
+    monthly = [rolling.update(values[row]) for row in range(300, len(dates))]
+    streamed = np.concatenate([first] + monthly, axis=1)
+    np.testing.assert_allclose(streamed, means, rtol=1e-9, atol=1e-9, equal_nan=True)
+    print("Streaming updates match the whole record")
+
+    # Benchmark against the shifted sums
+    for name, kernel in [('shifted sums', lambda: lagged_means(values, SCALES)),
+                         ('cumulative sum', lambda: nlb.rolling_means(values)),
+                         ('pandas rolling', lambda: [frame.rolling(window=months).mean()
+                                                     for months in SCALES])]:
+        kernel()
+        start = time.perf_counter()
+        for _ in range(5):
+            kernel()
+        print(f"{name}: {1000 * (time.perf_counter() - start) / 5:.1f} ms")
+    start = time.perf_counter()
+    for row in range(len(dates) - 12, len(dates)):
+        rolling.update(values[row])
+    print(f"streaming update: {1000 * (time.perf_counter() - start) / 12:.2f} ms/month")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+import subprocess
+import numpy as np
+import pandas as pd
+from helpers import country_dir
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.nalbantis import Nalbantis, njit
+
+    if njit is None:
+        print("numba is not installed, the NumPy engine is used")
+        return
+
+    # Monthly streamflow of 1500 stations since 1991, with a gap, a late
+    # start, a station without data and one with a gap in the last months
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1991-01-01", "2024-12-01", freq="MS")
+    months = dates.month.to_numpy()
+    values = rng.gamma(2.0, 10.0, size=(len(dates), 1500)).astype(np.float32)
+    values[:30, 7] = np.nan
+    values[100:103, 8] = np.nan
+    values[:, 9] = np.nan
+    values[-3, 10] = np.nan
+    numpy_nlb = Nalbantis(engine="numpy")
+    numba_nlb = Nalbantis(engine="numba")
+    # numba is opt-in: "auto" only compiles the kernel for large cubes
+    assert Nalbantis().engine == "numpy"
+    assert not Nalbantis(engine="auto")._use_numba(values)
+
+    # Same SDI of every month and of the latest month as the NumPy engine
+    start = time.perf_counter()
+    sdi = numba_nlb.compute_array(values, months)
+    print(f"numba first call (compilation included): {time.perf_counter() - start:.2f} s")
+    expected = numpy_nlb.compute_array(values, months)
+    np.testing.assert_allclose(sdi, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+    latest, has_data = numba_nlb.compute_latest_array(values, months)
+    expected_latest, expected_has_data = numpy_nlb.compute_latest_array(values, months)
+    assert np.array_equal(has_data, expected_has_data) and not has_data[9]
+    assert np.isfinite(latest[10]).all()
+    np.testing.assert_allclose(latest, expected_latest, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    # Also with each scale valid on its own
+    numpy_scales = Nalbantis(engine="numpy", per_scale=True)
+    numba_scales = Nalbantis(engine="numba", per_scale=True)
+    np.testing.assert_allclose(numba_scales.compute_array(values, months),
+                               numpy_scales.compute_array(values, months),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+    latest, has_data = numba_scales.compute_latest_array(values, months)
+    expected_latest, expected_has_data = numpy_scales.compute_latest_array(values, months)
+    assert np.array_equal(has_data, expected_has_data) and not has_data[9]
+    assert np.isfinite(latest[10, 0]) and np.isnan(latest[10, 1:]).all()
+    np.testing.assert_allclose(latest, expected_latest, rtol=1e-9, atol=1e-9, equal_nan=True)
+    print("numba kernel matches the NumPy engine")
+
+    # The kernel also runs when imported through a country main, in a new
+    # process (nothing compiled is cached on disk between module paths)
+    script = ("import numpy as np, main\n"
+              "from modules.nalbantis import Nalbantis\n"
+              "values = np.random.default_rng(0).gamma(2.0, 10.0, size=(48, 10))\n"
+              "latest, has_data = Nalbantis(engine='numba').compute_latest_array(\n"
+              "    values, np.arange(48) % 12 + 1)\n"
+              "assert has_data.all() and np.isfinite(latest).all()\n")
+    subprocess.run([sys.executable, "-c", script], cwd=country_dir(), check=True)
+    print("numba kernel runs through the country main")
+
+    # Benchmark both engines
+    for n_stations in [1500, 10000]:
+        block = rng.gamma(2.0, 10.0, size=(len(dates), n_stations)).astype(np.float32)
+        for nlb in [numpy_nlb, numba_nlb]:
+            for name, kernel in [('every month', nlb.compute_array),
+                                 ('latest month', nlb.compute_latest_array)]:
+                kernel(block, months)
+                start = time.perf_counter()
+                for _ in range(3):
+                    kernel(block, months)
+                elapsed = 1000 * (time.perf_counter() - start) / 3
+                print(f"{nlb.engine} {name}, {n_stations} stations: {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
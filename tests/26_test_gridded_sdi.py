@@ -0,0 +1,85 @@
+import sys
+import os
+import json
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from helpers import build_store
+
+
+def river_coordinates(n_rivers: int = 2500) -> pd.DataFrame:
+    """Random coordinates of some rivers, numbered like build_store."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'rivid': np.arange(n_rivers, dtype=np.int64) + 610000000,
+                         'lon': rng.uniform(-70.0, -55.0, n_rivers),
+                         'lat': rng.uniform(-25.0, -8.0, n_rivers)})
+
+
+def main():
+    # Set up paths and call module
+    root = os.path.dirname(__file__)
+    sys.path.append(os.path.abspath(os.path.join(root, '..')))
+    from modules.geoglows import Geoglows
+    from modules.nalbantis import Nalbantis
+    from modules.gridded import GriddedSDI, CHECKPOINT_FILE
+
+    x_range, y_range = (-66.0, -58.0), (-23.0, -9.5)
+    window = {'start_date': '1991-01-01', 'end_date': '2000-12-01'}
+    with tempfile.TemporaryDirectory() as tmp:
+        rivers = river_coordinates()
+        build_store(os.path.join(tmp, "retrospective.zarr"), rivers.rivid, start="1991-01-01",
+                    end="2000-12-31", coords=rivers)
+        glw = Geoglows(store=os.path.join(tmp, "retrospective.zarr"))
+        dataset = glw.get_bucket()
+        nlb = Nalbantis()
+        grid = GriddedSDI(os.path.join(tmp, "gridded"), x_range, y_range)
+
+        # Rivers inside the box, from the dataset or from a rivers table
+        selected = grid.select_rivers(dataset)
+        inside = rivers.lon.between(*x_range) & rivers.lat.between(*y_range)
+        assert selected.rivid.tolist() == rivers.rivid[inside].tolist()
+        table = rivers.rename(columns={'rivid': 'LINKNO'}).iloc[::-1]
+        assert grid.select_rivers(dataset.drop_vars(['lon', 'lat']), table).equals(selected)
+
+        # Blocks of whole chunks, each chunk read once
+        blocks = grid.plan_blocks(glw, dataset, selected.rivid.to_numpy(), block_size=250)
+        chunks = [np.unique(glw.get_positions(dataset, selected.rivid.to_numpy()[block]) // 100)
+                  for block in blocks]
+        assert sum(len(block) for block in blocks) == len(selected)
+        assert len(np.concatenate(chunks)) == len(np.unique(np.concatenate(chunks)))
+
+        # Same SDI as the whole box at once
+        start = time.perf_counter()
+        assert grid.run(glw, dataset, nlb, selected, block_size=250, **window) == len(blocks)
+        run_time = time.perf_counter() - start
+        sdi = grid.read()
+        data = glw.get_data(ds=dataset, comids=selected.rivid.tolist(), chunk_aligned=True, **window)
+        expected, _ = nlb.compute_latest_array(data.to_numpy(), data.index.month.to_numpy())
+        assert sdi.rivid.tolist() == selected.rivid.tolist()
+        np.testing.assert_allclose(sdi[['1', '3', '6', '9', '12']].to_numpy(), expected,
+                                   rtol=1e-5, atol=1e-5)
+        print(f"Gridded SDI of {len(sdi)} rivers in {len(blocks)} blocks "
+              f"matches the whole box ({run_time:.2f} s)")
+
+        # An interrupted run resumes from its checkpoint
+        checkpoint_path = os.path.join(tmp, "gridded", CHECKPOINT_FILE)
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        checkpoint['done'] = checkpoint['done'][:-2]
+        with open(checkpoint_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.remove(grid.path)
+        assert grid.run(glw, dataset, nlb, selected, block_size=250, **window) == 2
+        assert grid.read().equals(sdi)
+        assert grid.run(glw, dataset, nlb, selected, block_size=250, **window) == 0
+
+        # Another block size or month starts again
+        assert grid.run(glw, dataset, nlb, selected, block_size=500, **window) > 0
+        assert grid.run(glw, dataset, nlb, selected, block_size=500, restart=True,
+                        **window) > 0
+        print("Interrupted runs resume from the checkpoint")
+
+
+if __name__ == "__main__":
+    main()
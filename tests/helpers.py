@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+from collections.abc import MutableMapping
+
+# Directory holding the shared modules and the national pipelines
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# National pipeline whose configuration (main.py and assets) is used by the
+# tests that need one, e.g. COUNTRY=peru python tests/13_test_mask_cache.py
+COUNTRY = os.environ.get("COUNTRY", "ecuador")
+
+# National pipeline with the historical data and published outputs that the
+# reference checks compare against (only Chile ships them)
+DATA_COUNTRY = os.environ.get("DATA_COUNTRY", "chile")
+
+
+def country_dir(country: str = COUNTRY) -> str:
+    """Directory of a national pipeline."""
+    return os.path.join(ROOT, country)
+
+
+def build_store(path: str, rivids, start: str = "1990-01-01", end: str = "1995-12-31",
+                chunks: tuple = (None, 100), gap: tuple = None, coords: pd.DataFrame = None) -> None:
+    """
+    Write a daily Qout dataset laid out like retrospective.zarr.
+
+    Args:
+        path (str): The zarr directory.
+        rivids: The rivers (a list), or their number (numbered from 610000000).
+        start (str): First day of the time axis.
+        end (str): Last day of the time axis.
+        chunks (tuple): The (time, rivid) chunk shape, None for the whole
+                        axis.
+        gap (tuple): The (rows, column) of Qout set to NaN, if any.
+        coords (pd.DataFrame): The 'lon' and 'lat' of each river, stored as
+                               coordinates along rivid, if any.
+    """
+    rng = np.random.default_rng(0)
+    time_index = pd.date_range(start, end, freq="D")
+    if np.isscalar(rivids):
+        rivids = np.arange(rivids) + 610000000
+    rivids = np.asarray(rivids, dtype=np.int64)
+    qout = rng.gamma(2.0, 10.0, size=(len(time_index), len(rivids))).astype(np.float32)
+    if gap is not None:
+        qout[gap] = np.nan
+    coordinates = {"time": time_index, "rivid": rivids}
+    if coords is not None:
+        coordinates.update({name: ("rivid", coords[name].to_numpy()) for name in ['lon', 'lat']})
+    ds = xr.Dataset({"Qout": (("time", "rivid"), qout)}, coords=coordinates)
+    chunks = tuple(len(time_index) if size is None else size for size in chunks)
+    ds.to_zarr(path, mode="w", encoding={"Qout": {"chunks": chunks}})
+
+
+class CountingStore(MutableMapping):
+    """A zarr store wrapper that counts the Qout chunks read."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self.reads = 0
+
+    def __getitem__(self, key):
+        if key.startswith("Qout/") and not key.endswith((".zarray", ".zattrs")):
+            self.reads += 1
+        return self.store[key]
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def __setitem__(self, key, value):
+        self.store[key] = value
+
+    def __delitem__(self, key):
+        del self.store[key]
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)